@@ -0,0 +1,200 @@
+import argparse
+import os
+import sqlite3
+
+try:
+	import pyarrow
+	import pyarrow.compute
+	import pyarrow.csv
+	import pyarrow.dataset
+except ImportError: # Checked in main, the statistics are computed on Arrow tables
+	pyarrow = None
+
+from hearing_loader import load_hearing_data
+
+
+hd = load_hearing_data()
+
+# Number of rows of the output read at a time
+BATCH_SIZE = 64 * 1024
+
+# Number of rows the per-batch aggregates are left to grow to before they are combined
+PARTIAL_ROWS = 1024 * 1024
+
+# Columns each statement is aggregated by, the finest grouping every statistic is computed from
+SPEAKER_HEARING_KEYS = ['congress', 'committee', 'document', 'date', 'name', 'state', 'role']
+
+# Columns stored as dictionary arrays, each distinct value held once
+CATEGORICAL_COLUMNS = ['congress', 'committee', 'name', 'state', 'role']
+
+# Statements of an SQLite output in the columns of the other formats
+SQLITE_QUERY = "SELECT d.congress, d.committee, s.document, s.date, p.name, p.state, p.role, s.text " \
+	"FROM statements s JOIN documents d ON d.id = s.document JOIN participants p ON p.id = s.participant"
+
+
+# Returns the format of an output from its path, as hearing-data.py names them by default
+def detect_format(path):
+	if os.path.isdir(path):
+		return 'parquet'
+	elif os.path.splitext(path)[1] == '.db':
+		return 'sqlite'
+	return 'csv'
+
+
+# Reads the statements of an output in record batches, so that only batch_size rows are held at a time
+# A partitioned Parquet output is read one file after another, taking the congress from the partition
+def read_batches(path, format, batch_size=BATCH_SIZE):
+	columns = SPEAKER_HEARING_KEYS + ['text']
+
+	if format == 'csv':
+		reader = pyarrow.csv.open_csv(path, read_options=pyarrow.csv.ReadOptions(block_size=batch_size * 512), \
+			parse_options=pyarrow.csv.ParseOptions(newlines_in_values=True), \
+			convert_options=pyarrow.csv.ConvertOptions(include_columns=columns, \
+			column_types={column: pyarrow.string() for column in columns}))
+		yield from reader
+
+	elif format == 'parquet':
+		# Files being written are left out, they are renamed once complete
+		paths = sorted(os.path.join(directory, name) for directory, _, names in os.walk(path) \
+			       for name in names if name.endswith('.parquet'))
+		partitioning = pyarrow.dataset.partitioning(pyarrow.schema([('congress', pyarrow.string())]), flavor='hive')
+		dataset = pyarrow.dataset.dataset(paths, format='parquet', partitioning=partitioning, partition_base_dir=path)
+		yield from dataset.to_batches(columns=columns, batch_size=batch_size)
+
+	elif format == 'sqlite':
+		connection = sqlite3.connect(path)
+		try:
+			cursor = connection.execute(SQLITE_QUERY)
+			while True:
+				rows = cursor.fetchmany(batch_size)
+				if len(rows) == 0:
+					break
+				yield pyarrow.RecordBatch.from_arrays([pyarrow.array([None if row[i] is None else str(row[i]) \
+					for row in rows], pyarrow.string()) for i in range(len(columns))], names=columns)
+		finally:
+			connection.close()
+
+
+# Returns the statements and words of each speaker in each hearing of a batch, with the categorical columns
+# dictionary encoded
+def aggregate_batch(batch):
+	words = pyarrow.compute.fill_null(pyarrow.compute.count_substring_regex(batch.column('text'), r'\S+'), 0)
+	columns = {column: batch.column(column) for column in SPEAKER_HEARING_KEYS}
+	for column in CATEGORICAL_COLUMNS:
+		columns[column] = pyarrow.compute.dictionary_encode(columns[column])
+	columns['words'] = pyarrow.compute.cast(words, pyarrow.int64())
+
+	table = pyarrow.table(columns)
+	return table.group_by(SPEAKER_HEARING_KEYS).aggregate([('words', 'count'), ('words', 'sum')]) \
+		.rename_columns(SPEAKER_HEARING_KEYS + ['statements', 'words'])
+
+
+# Adds up aggregates that may hold the same speaker and hearing more than once
+def combine(tables):
+	table = pyarrow.concat_tables(tables).unify_dictionaries()
+	return table.group_by(SPEAKER_HEARING_KEYS).aggregate([('statements', 'sum'), ('words', 'sum')]) \
+		.rename_columns(SPEAKER_HEARING_KEYS + ['statements', 'words'])
+
+
+# Returns the statements and words of every speaker in every hearing of the output, a row for each, reading
+# the output in batches and combining their aggregates whenever they grow past partial_rows
+def speaker_hearings(batches, partial_rows=PARTIAL_ROWS):
+	partials = []
+	size = 0
+	for batch in batches:
+		if batch.num_rows == 0:
+			continue
+		partials.append(aggregate_batch(batch))
+		size += partials[-1].num_rows
+		if size > partial_rows:
+			partials = [combine(partials)]
+			size = partials[0].num_rows
+
+	if len(partials) == 0:
+		return None
+	return combine(partials)
+
+
+# Counts the hearings of each group, from rows holding each hearing at most once per group
+def hearings_by(table, keys):
+	hearings = table.group_by(keys + ['document', 'date']).aggregate([])
+	return hearings.group_by(keys).aggregate([('document', 'count')]).rename_columns(keys + ['hearings'])
+
+
+# Returns the statements, words and hearings of each group of speaker hearings
+def group_statistics(table, keys):
+	totals = table.group_by(keys).aggregate([('statements', 'sum'), ('words', 'sum')]) \
+		.rename_columns(keys + ['statements', 'words'])
+	return totals.join(hearings_by(table, keys), keys).sort_by([('words', 'descending')])
+
+
+def member_statistics(table):
+	return group_statistics(table, ['name', 'state', 'role'])
+
+
+def committee_statistics(table):
+	return group_statistics(table, ['congress', 'committee'])
+
+
+def congress_statistics(table):
+	return group_statistics(table, ['congress'])
+
+
+# Returns the share of the words of each hearing spoken by each of its speakers
+def hearing_shares(table):
+	totals = table.group_by(['document', 'date']).aggregate([('words', 'sum')]) \
+		.rename_columns(['document', 'date', 'hearing_words'])
+	table = table.join(totals, ['document', 'date'])
+	share = pyarrow.compute.divide(pyarrow.compute.cast(table.column('words'), pyarrow.float64()), \
+		pyarrow.compute.cast(table.column('hearing_words'), pyarrow.float64()))
+	return table.append_column('share', share) \
+		.sort_by([('document', 'ascending'), ('date', 'ascending'), ('share', 'descending')])
+
+
+STATISTICS = {'members': member_statistics, 'committees': committee_statistics, 'congresses': congress_statistics, \
+	      'hearings': hearing_shares}
+
+
+# Returns a table with its dictionary encoded columns decoded, for writing or printing
+def decoded(table):
+	columns = [pyarrow.compute.cast(column, column.type.value_type) \
+		   if pyarrow.types.is_dictionary(column.type) else column for column in table.columns]
+	return pyarrow.table(columns, names=table.column_names)
+
+
+def main():
+	parser = argparse.ArgumentParser(description='Computes statistics of the statements in an output of ' \
+		'hearing-data.py.')
+	parser.add_argument('output', nargs='?', default=hd.DEFAULT_OUTPUTS['csv'], \
+			    help='output of hearing-data.py to read (defaults to {})'.format(hd.DEFAULT_OUTPUTS['csv']))
+	parser.add_argument('statistics', nargs='?', choices=STATISTICS.keys(), default='members', \
+			    help='statistics to compute: statements, words and hearings of each member, committee ' \
+			    'or Congress, or the share of the words of each hearing spoken by each speaker')
+	parser.add_argument('-f', '--format', choices=hd.OUTPUT_FORMATS.keys(), \
+			    help='format of the output (detected from its path by default)')
+	parser.add_argument('-o', '--save', help='CSV file to write the statistics to')
+	parser.add_argument('-n', '--top', type=int, default=20, help='number of rows to print')
+	parser.add_argument('--batch-size', type=int, default=BATCH_SIZE, help='number of rows read at a time')
+	args = parser.parse_args()
+
+	if pyarrow is None:
+		parser.error('statistics need pyarrow (pip install pyarrow)')
+	if not os.path.exists(args.output):
+		parser.error('no output at {}'.format(args.output))
+
+	table = speaker_hearings(read_batches(args.output, args.format or detect_format(args.output), args.batch_size))
+	if table is None:
+		print("No statements in {}".format(args.output))
+		return
+	statistics = decoded(STATISTICS[args.statistics](table))
+
+	if args.save:
+		pyarrow.csv.write_csv(statistics, args.save)
+	for row in statistics.slice(0, args.top).to_pylist():
+		print('  '.join(str(value) for value in row.values()))
+	if statistics.num_rows > args.top:
+		print("... {} more rows".format(statistics.num_rows - args.top))
+
+
+if __name__ == "__main__":
+	main()
@@ -0,0 +1,486 @@
+import argparse
+import contextlib
+import os
+import re
+import sys
+import time
+import timeit
+import tracemalloc
+
+from hearing_loader import load_hearing_data
+
+
+hd = load_hearing_data()
+
+# Directory the recorded pages of the fixture documents are kept in
+FIXTURE_DIRECTORY = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'benchmark-fixtures')
+
+# The documents main() of hearing-data.py gives as examples, each exercising a different part of the parser
+FIXTURE_DOCUMENTS = [
+	'CHRG-115hhrg33477',
+	'CHRG-117hhrg45006',
+	'CHRG-117hhrg46542', # Includes multiple hearings
+	'CHRG-115hhrg31359', # Doesn't have text
+	'CHRG-117hhrg46928', # Features sources and a letter in text
+	'CHRG-117hhrg44243', # Includes reports inside the text
+	'CHRG-117hhrg44244', # Includes questions inside the text
+]
+
+# Synthetic hearings committed in the fixture directory, laid out like the pages of govinfo and covering the
+# same cases as the fixture documents, so that the parse benchmark runs offline on a fresh checkout. The names
+# and text in them are made up.
+SAMPLE_DOCUMENTS = [
+	'sample-hearing',
+	'sample-multiple-hearings',
+	'sample-no-text',
+	'sample-sources-letter',
+	'sample-reports',
+	'sample-questions',
+]
+
+
+# Reads the paragraphs of the given HTML files and of the given documents in the page cache
+def read_paragraphs(paths, document_ids, cache_directory):
+	pages = []
+	for path in paths:
+		with open(path, 'rb') as page_file:
+			pages.append(page_file.read())
+
+	if len(document_ids) > 0:
+		cache = hd.PageCache(cache_directory, offline=True)
+		for document_id in document_ids:
+			page = cache.get(document_id, 'html')
+			if page is None:
+				print("WARNING: Document {} isn't in the page cache".format(document_id))
+			else:
+				pages.append(page)
+
+	paragraphs = []
+	for page in pages:
+		paragraphs += [paragraph.strip() for paragraph in hd.join_paragraphs(hd.page_lines(page)) \
+			       if paragraph.strip() != '']
+
+	return paragraphs
+
+
+# The bracket and tag removal loops process_paragraph used before remove_extraneous_text
+# Returns None when the loops wouldn't end, which they don't when a closing brace comes before the opening one
+def remove_extraneous_text_loop(paragraph):
+	while True:
+		start_brace = paragraph.find('[')
+		end_brace = paragraph.find(']')
+		if start_brace == -1 and end_brace == -1:
+			break
+		elif start_brace == -1:
+			paragraph = paragraph[end_brace+1:]
+		elif end_brace == -1:
+			paragraph = paragraph[:start_brace]
+		elif end_brace < start_brace:
+			return None
+		else:
+			paragraph = paragraph[:start_brace] + ' ' + paragraph[end_brace+1:]
+	while True:
+		start_brace = paragraph.find('<')
+		end_brace = paragraph.find('>')
+		if start_brace == -1 or end_brace == -1:
+			break
+		elif end_brace < start_brace:
+			return None
+		else:
+			paragraph = paragraph[:start_brace] + ' ' + paragraph[end_brace+1:]
+
+	return paragraph
+
+
+# Times a function over all paragraphs and returns the best time in seconds of repeat runs
+def time_paragraphs(function, paragraphs, repeat):
+	return min(timeit.repeat(lambda: [function(paragraph) for paragraph in paragraphs], number=1, repeat=repeat))
+
+
+# Returns whether a new implementation took longer than the old one it replaces, reporting it if so
+def slower(name, elapsed, old_name, old_elapsed):
+	if elapsed <= old_elapsed:
+		return False
+	print("REGRESSION: {} is {:.1f}x slower than {}".format(name, elapsed / old_elapsed, old_name))
+	return True
+
+
+# Compares remove_extraneous_text against the old loops on the given paragraphs
+def benchmark_clean(paragraphs, repeat):
+	expected = [remove_extraneous_text_loop(paragraph) for paragraph in paragraphs]
+	comparable = [paragraph for paragraph, result in zip(paragraphs, expected) if result is not None]
+	print("{} paragraphs, {} with brackets or tags, {} the old loops never finish on".format(len(paragraphs), \
+		sum(1 for paragraph in paragraphs if '[' in paragraph or ']' in paragraph or '<' in paragraph), \
+		len(paragraphs) - len(comparable)))
+
+	mismatches = [paragraph for paragraph, result in zip(paragraphs, expected) \
+		      if result is not None and hd.remove_extraneous_text(paragraph) != result]
+	for paragraph in mismatches[:10]:
+		print("MISMATCH: {!r}".format(paragraph[:200]))
+
+	loop_time = time_paragraphs(remove_extraneous_text_loop, comparable, repeat)
+	regex_time = time_paragraphs(hd.remove_extraneous_text, comparable, repeat)
+	print("loops: {:.4f}s  single pass: {:.4f}s  speedup: {:.1f}x".format(loop_time, regex_time, \
+		loop_time / regex_time if regex_time > 0 else float('inf')))
+
+	return len(mismatches) == 0 and not slower('single pass', regex_time, 'loops', loop_time)
+
+
+# Prefixes process_paragraph compared every line against before Line
+CHAIR_IDS = ['The Chairman.', 'The Chairwoman.', 'The Chairperson.', 'The Chair.']
+ALT_IDS = ['The Clerk.', '[The information follows:]', 'Letter of', 'Letter from']
+
+
+# The per-line work of process_hearing, process_paragraph and get_participant before Line, returning what
+# Line and SpeakerStringList.matches tell apart
+def classify_loop(paragraph, invalid_speaker_strings):
+	words = paragraph.strip().split()
+	words = list(map(lambda x : x[:-1] if x[-1] == ',' else x, words))
+
+	paragraph = paragraph.strip()
+	words = paragraph.split()
+
+	marker = None
+	for id in CHAIR_IDS:
+		if paragraph[:len(id)].casefold() == id.casefold():
+			marker = 'chair'
+	for id in ALT_IDS:
+		if paragraph[:len(id)].casefold() == id.casefold():
+			marker = 'alt'
+	statement = len(words) > 1 and (words[0].casefold() == 'statement'.casefold() or \
+		words[1].casefold() == 'statement'.casefold())
+
+	words = paragraph.split()
+	invalid = False
+	for string in invalid_speaker_strings:
+		if len(words) > 1 and words[0] == string[0] and words[1] == string[1]:
+			if len(string) > 2 and len(words) > 2:
+				if words[2] == string[2]:
+					invalid = True
+			else:
+				invalid = True
+	candidate = not (len(words) <= 3 or not (words[1][-1] == '.' or words[2][-1] == '.' or \
+		(len(words) >= 5 and (words[3][-1] == '.' or words[4][-1] == '.') and words[2] == 'of')))
+
+	return marker, statement, invalid, candidate
+
+
+def classify_line(paragraph, invalid_speaker_strings):
+	line = hd.Line(paragraph)
+	return line.marker, line.statement, invalid_speaker_strings.matches(line.words), line.candidate
+
+
+# Compares Line against the per-line work it replaced, with the invalid speaker strings of the state store
+def benchmark_classify(paragraphs, repeat, state_directory):
+	invalid_speaker_strings = hd.StateStore(state_directory).invalid_speaker_strings
+	print("{} paragraphs, {} invalid speaker strings".format(len(paragraphs), len(invalid_speaker_strings)))
+
+	mismatches = [paragraph for paragraph in paragraphs if classify_loop(paragraph, invalid_speaker_strings) \
+		      != classify_line(paragraph, invalid_speaker_strings)]
+	for paragraph in mismatches[:10]:
+		print("MISMATCH: {!r}".format(paragraph[:200]))
+
+	loop_time = time_paragraphs(lambda paragraph: classify_loop(paragraph, invalid_speaker_strings), \
+		paragraphs, repeat)
+	line_time = time_paragraphs(lambda paragraph: classify_line(paragraph, invalid_speaker_strings), \
+		paragraphs, repeat)
+	print("loops: {:.0f} paragraphs/s  classifier: {:.0f} paragraphs/s  speedup: {:.1f}x".format( \
+		len(paragraphs) / loop_time, len(paragraphs) / line_time, loop_time / line_time))
+
+	return len(mismatches) == 0
+
+
+# Path of the recorded page of the given type of a document
+def fixture_path(directory, document_id, type):
+	return os.path.join(directory, '{}.{}'.format(document_id, 'xml' if type == 'mods' else type))
+
+
+# Downloads the MODS and HTML pages of the documents into the fixture directory, reading them from the page
+# cache when one is given. Returns whether every page was recorded.
+def record_fixtures(document_ids, directory, cache_directory=None):
+	if cache_directory is not None:
+		hd.page_cache = hd.PageCache(cache_directory)
+	os.makedirs(directory, exist_ok=True)
+
+	recorded = True
+	try:
+		for document_id in document_ids:
+			for type in ('mods', 'html'):
+				page = hd.get_page(document_id, type)
+				if isinstance(page, hd.FetchFailure):
+					recorded = False
+					continue
+				with open(fixture_path(directory, document_id, type), 'wb') as fixture_file:
+					fixture_file.write(page)
+				print("Recorded {} page of {} ({} bytes)".format(type, document_id, len(page)))
+	finally:
+		if hd.page_cache is not None:
+			hd.page_cache.close()
+
+	return recorded
+
+
+# Returns the sample documents and the fixture documents that have been recorded, the documents the parse
+# benchmark runs on by default
+def default_fixtures(directory):
+	return SAMPLE_DOCUMENTS + [document_id for document_id in FIXTURE_DOCUMENTS \
+		if all(os.path.exists(fixture_path(directory, document_id, type)) for type in ('mods', 'html'))]
+
+
+# Reads the recorded pages of the documents, returning (document_id, mods, html) for those with both pages
+def read_fixtures(document_ids, directory):
+	fixtures = []
+	for document_id in document_ids:
+		paths = [fixture_path(directory, document_id, type) for type in ('mods', 'html')]
+		if not all(os.path.exists(path) for path in paths):
+			print("WARNING: Document {} hasn't been recorded, run the record benchmark first".format(document_id))
+			continue
+
+		pages = []
+		for path in paths:
+			with open(path, 'rb') as fixture_file:
+				pages.append(fixture_file.read())
+		fixtures.append((document_id, pages[0], pages[1]))
+
+	return fixtures
+
+
+# Parses the fixtures once, returning the metadata of each document and the arguments process_html_file
+# passes to process_hearing for each hearing, so that each stage can be run on its own inputs
+def parse_inputs(fixtures, state):
+	documents = []
+	hearings = []
+
+	def record_hearing(paragraphs, data, participants, chairperson, state=None):
+		paragraphs = list(paragraphs)
+		hearings.append((paragraphs, data, participants.copy(), chairperson))
+		return process_hearing(paragraphs, data, participants, chairperson, state)
+
+	process_hearing = hd.process_hearing
+	hd.process_hearing = record_hearing
+	try:
+		for document_id, mods, html in fixtures:
+			data, participants = hd.process_xml_file(document_id, mods)
+			documents.append((document_id, data, participants.copy(), html))
+			list(hd.process_html_file(document_id, data, participants, html, state.copy()))
+	finally:
+		hd.process_hearing = process_hearing
+		hd.review_queue.drain()
+
+	return documents, hearings
+
+
+def xml_stage(fixtures, state):
+	start = time.perf_counter()
+	for document_id, mods, html in fixtures:
+		hd.process_xml_file(document_id, mods)
+	return time.perf_counter() - start, {'documents': len(fixtures)}
+
+
+def html_stage(documents, hearings, state):
+	# Participants and state are added to while parsing, so every run starts from copies of them
+	inputs = [(document_id, data, participants.copy(), html, state.copy()) \
+		  for document_id, data, participants, html in documents]
+
+	entries = 0
+	start = time.perf_counter()
+	for document_id, data, participants, html, document_state in inputs:
+		for entry in hd.process_html_file(document_id, data, participants, html, document_state):
+			entries += 1
+	elapsed = time.perf_counter() - start
+
+	return elapsed, {'paragraphs': sum(len(hearing[0]) for hearing in hearings), 'entries': entries}
+
+
+def hearing_stage(documents, hearings, state):
+	inputs = [(paragraphs, data, participants.copy(), chairperson, state.copy()) \
+		  for paragraphs, data, participants, chairperson in hearings]
+
+	entries = 0
+	start = time.perf_counter()
+	for paragraphs, data, participants, chairperson, hearing_state in inputs:
+		for entry in hd.process_hearing(paragraphs, data, participants, chairperson, hearing_state):
+			entries += 1
+	elapsed = time.perf_counter() - start
+
+	return elapsed, {'paragraphs': sum(len(hearing[0]) for hearing in hearings), 'entries': entries}
+
+
+# process_paragraph depends on what process_hearing has seen before each paragraph, so it's timed by the time
+# spent in its calls while process_hearing runs
+def paragraph_stage(documents, hearings, state):
+	elapsed = 0
+	calls = 0
+
+	def timed_paragraph(*args, **kwargs):
+		nonlocal elapsed, calls
+		start = time.perf_counter()
+		try:
+			return process_paragraph(*args, **kwargs)
+		finally:
+			elapsed += time.perf_counter() - start
+			calls += 1
+
+	process_paragraph = hd.process_paragraph
+	hd.process_paragraph = timed_paragraph
+	try:
+		hearing_stage(documents, hearings, state)
+	finally:
+		hd.process_paragraph = process_paragraph
+
+	return elapsed, {'paragraphs': calls}
+
+
+# Runs a stage repeat times and returns the best time in seconds with its counts, along with the peak memory
+# in bytes of one more run under tracemalloc, which is kept out of the timed runs since tracing slows them down
+def measure(stage, repeat, memory=True):
+	runs = []
+	for _ in range(repeat):
+		runs.append(stage())
+		hd.review_queue.drain()
+	elapsed, counts = min(runs, key=lambda run: run[0])
+
+	peak = None
+	if memory:
+		tracemalloc.start()
+		try:
+			stage()
+			peak = tracemalloc.get_traced_memory()[1]
+		finally:
+			tracemalloc.stop()
+			hd.review_queue.drain()
+
+	return elapsed, counts, peak
+
+
+# Times process_xml_file, process_html_file, process_hearing and process_paragraph on the recorded fixtures
+def benchmark_parse(fixtures, repeat, state_directory):
+	# Ambiguous speakers are queued as in headless mode instead of being asked about
+	hd.interactive = False
+	state = hd.StateStore(state_directory)
+	documents, hearings = parse_inputs(fixtures, state)
+	print("{} documents, {} hearings, {} paragraphs".format(len(fixtures), len(hearings), \
+		sum(len(hearing[0]) for hearing in hearings)))
+
+	stages = [('process_xml_file', lambda: xml_stage(fixtures, state), True), \
+		  ('process_html_file', lambda: html_stage(documents, hearings, state), True), \
+		  ('process_hearing', lambda: hearing_stage(documents, hearings, state), True), \
+		  ('process_paragraph', lambda: paragraph_stage(documents, hearings, state), False)]
+	for name, stage, memory in stages:
+		# Warnings were printed while reading the inputs, and would be printed again on every run
+		with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+			elapsed, counts, peak = measure(stage, repeat, memory)
+
+		rates = ["{:.0f} {}/s".format(count / elapsed if elapsed > 0 else float('inf'), unit) \
+			 for unit, count in counts.items()]
+		if peak is not None:
+			rates.append("peak {:.1f} MiB".format(peak / (1024 * 1024)))
+		print("{:<18} {:.4f}s  {}".format(name, elapsed, '  '.join(rates)))
+
+	return True
+
+
+# The search for the hearing dates before find_last_dates, a scan of every text for each date taking its last
+# match
+def find_last_dates_scan(texts, date_strings):
+	last = []
+	for date_string in date_strings:
+		pattern = re.compile(re.escape(date_string), re.IGNORECASE)
+		found = None
+		for index, text in enumerate(texts):
+			for match in pattern.finditer(text):
+				found = (index, match)
+		last.append(found)
+	return last
+
+
+# Compares find_last_dates against a scan for each date on the lines of the fixtures, as process_html_file
+# looks for the dates of their hearings
+def benchmark_dates(fixtures, repeat):
+	inputs = []
+	for document_id, mods, html in fixtures:
+		data, _ = hd.process_xml_file(document_id, mods)
+		if len(data) > 0:
+			inputs.append((list(hd.page_lines(html)), [hd.format_hearing_date(hearing['date']) for hearing in data]))
+	print("{} documents, {} lines, {} dates".format(len(inputs), sum(len(lines) for lines, _ in inputs), \
+		sum(len(date_strings) for _, date_strings in inputs)))
+
+	def spans(found):
+		return [None if start is None else (start[0], start[1].span()) for start in found]
+	mismatches = [date_strings for lines, date_strings in inputs \
+		      if spans(find_last_dates_scan(lines, date_strings)) != spans(hd.find_last_dates(lines, date_strings))]
+	for date_strings in mismatches[:10]:
+		print("MISMATCH: {}".format(date_strings))
+
+	def run(function):
+		return lambda: [function(lines, date_strings) for lines, date_strings in inputs]
+	scan_time = min(timeit.repeat(run(find_last_dates_scan), number=1, repeat=repeat))
+	search_time = min(timeit.repeat(run(hd.find_last_dates), number=1, repeat=repeat))
+	print("scan per date: {:.4f}s  find_last_dates: {:.4f}s  speedup: {:.1f}x".format(scan_time, search_time, \
+		scan_time / search_time if search_time > 0 else float('inf')))
+
+	return len(mismatches) == 0 and not slower('find_last_dates', search_time, 'scan per date', scan_time)
+
+
+def main():
+	parser = argparse.ArgumentParser(description='Benchmarks the hot paths of hearing-data.py on real hearings.')
+	subparsers = parser.add_subparsers(dest='benchmark', required=True)
+
+	sources = argparse.ArgumentParser(add_help=False)
+	sources.add_argument('pages', nargs='*', help='HTML pages of hearings')
+	sources.add_argument('-d', '--document', action='append', default=[], \
+			     help='ID of a document to read from the page cache')
+	sources.add_argument('--cache', default=hd.CACHE_DIRECTORY, help='directory of the page cache')
+	sources.add_argument('--repeat', type=int, default=5, help='number of timed runs, the best is kept')
+
+	subparsers.add_parser('clean', parents=[sources], help='bracket and tag removal in process_paragraph')
+	classify_parser = subparsers.add_parser('classify', parents=[sources], \
+						help='splitting and classifying each line of a hearing')
+	classify_parser.add_argument('--state', default='.', \
+				     help='directory of the invalid speaker strings file')
+
+	fixtures = argparse.ArgumentParser(add_help=False)
+	fixtures.add_argument('-d', '--document', action='append', \
+			      help='ID of a fixture document (defaults to all of them, along with the samples when parsing)')
+	fixtures.add_argument('--fixtures', default=FIXTURE_DIRECTORY, help='directory of the recorded pages')
+
+	record_parser = subparsers.add_parser('record', parents=[fixtures], \
+					      help='download the pages of the fixture documents')
+	record_parser.add_argument('--cache', help='directory of a page cache to read the pages from first')
+	parse_parser = subparsers.add_parser('parse', parents=[fixtures], \
+					     help='throughput of each parsing stage on the fixture documents, offline')
+	parse_parser.add_argument('--repeat', type=int, default=5, help='number of timed runs, the best is kept')
+	parse_parser.add_argument('--state', default='.', \
+				  help='directory of the invalid speaker strings, possible speakers and chairs files')
+	dates_parser = subparsers.add_parser('dates', parents=[fixtures], \
+					     help='finding the hearing dates in the text of the fixture documents, offline')
+	dates_parser.add_argument('--repeat', type=int, default=5, help='number of timed runs, the best is kept')
+	args = parser.parse_args()
+
+	if args.benchmark == 'record':
+		sys.exit(0 if record_fixtures(args.document or FIXTURE_DOCUMENTS, args.fixtures, args.cache) else 1)
+	elif args.benchmark == 'parse':
+		fixtures = read_fixtures(args.document or default_fixtures(args.fixtures), args.fixtures)
+		if len(fixtures) == 0:
+			parser.error('no recorded documents in {}'.format(args.fixtures))
+		sys.exit(0 if benchmark_parse(fixtures, args.repeat, args.state) else 1)
+	elif args.benchmark == 'dates':
+		fixtures = read_fixtures(args.document or default_fixtures(args.fixtures), args.fixtures)
+		if len(fixtures) == 0:
+			parser.error('no recorded documents in {}'.format(args.fixtures))
+		sys.exit(0 if benchmark_dates(fixtures, args.repeat) else 1)
+
+	paragraphs = read_paragraphs(args.pages, args.document, args.cache)
+	if len(paragraphs) == 0:
+		parser.error('no paragraphs to benchmark, give HTML pages or cached document IDs')
+
+	if args.benchmark == 'clean':
+		passed = benchmark_clean(paragraphs, args.repeat)
+	elif args.benchmark == 'classify':
+		passed = benchmark_classify(paragraphs, args.repeat, args.state)
+
+	sys.exit(0 if passed else 1)
+
+
+if __name__ == "__main__":
+	main()
@@ -1,10 +1,190 @@
 import requests
 from defusedxml import ElementTree as xml
-import urllib
 import re
 import csv
 import datetime
+import argparse
+import os
+import functools
+import urllib.parse
+import gzip
+import json
+import time
+import hashlib
+import random
+import email.utils
+import threading
+import sqlite3
+import codecs
+import itertools
+import bisect
+import io
+import mmap
+import zipfile
 from ast import literal_eval
+from collections import deque
+from html.parser import HTMLParser
+from concurrent.futures import Future, ThreadPoolExecutor, ProcessPoolExecutor
+
+try:
+	import pyarrow
+	import pyarrow.compute
+	import pyarrow.parquet
+except ImportError: # Only needed for Parquet output
+	pyarrow = None
+
+
+# Collections service url listing the hearings of a Congress, filled with the earliest modification date,
+# the congress, the offset mark of the page and the API key
+GOVINFO_LIST_URL = "https://api.govinfo.gov/collections/CHRG/{}?pageSize=1000&congress={}&docClass=hhrg" \
+	"&offsetMark={}&api_key={}"
+
+# Packages modified before this date are left out of a full listing
+LIST_START_DATE = '2017-01-01T00:00:00Z'
+
+# Directory where the listing of each Congress is kept along with the time it was fetched
+LISTING_DIRECTORY = 'listings'
+
+# Link service url for a document, filled with the congress, document number and link type
+GOVINFO_LINK_URL = "https://www.govinfo.gov/link/chrg/{}/{}?link-type={}"
+
+# Number of documents downloaded in parallel ahead of the parser
+FETCH_CONCURRENCY = 4
+
+# Headers sent with every request
+HEADERS = {"User-Agent": "Mozilla/5.0 (Windows NT 10.0; WOW64) AppleWebKit/537.36 (KHTML, like Gecko) " \
+	   "Chrome/47.0.2526.106 Safari/537.36"}
+
+# Number of keep-alive connections the shared session keeps open to each host
+POOL_SIZE = FETCH_CONCURRENCY
+
+# Number of hosts the shared session keeps connection pools for (api.govinfo.gov and www.govinfo.gov)
+POOL_HOSTS = 2
+
+# Requests per second and burst size allowed to each host. api.govinfo.gov counts against the api.data.gov
+# quota of the key (1,000 requests per hour by default), the link service on www.govinfo.gov is unkeyed.
+RATE_LIMITS = {'api.govinfo.gov': (1000 / 3600, 40), 'www.govinfo.gov': (10, 10)}
+
+# Connect and read timeouts in seconds for every request
+REQUEST_TIMEOUT = (10, 60)
+
+# Number of times a request is attempted before it is recorded as a failure
+MAX_ATTEMPTS = 5
+
+# Base and largest delay in seconds between attempts, before jitter
+BACKOFF_BASE = 1
+BACKOFF_MAX = 120
+
+# Status codes worth retrying
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+# Directory where downloaded pages are kept between runs
+CACHE_DIRECTORY = 'page-cache'
+
+# Size in bytes the compressed page cache may grow to before the least recently used pages are evicted
+CACHE_SIZE_LIMIT = 4 * 1024 * 1024 * 1024
+
+# Number of pages added to the page cache between saves of its index
+CACHE_SAVE_INTERVAL = 100
+
+# Number of package ZIPs kept open at once when reading pages from them
+PACKAGE_ARCHIVES_OPEN = 16
+
+# Size in bytes of the blocks pages are decoded and parsed in
+PAGE_BLOCK_SIZE = 64 * 1024
+
+# Size in bytes of the write buffer of the output file
+OUTPUT_BUFFER_SIZE = 1024 * 1024
+
+# Output written when no output is given, by format
+DEFAULT_OUTPUTS = {'csv': 'hearing-data.csv', 'parquet': 'hearing-data-parquet', 'sqlite': 'hearing-data-sqlite.db'}
+
+# Number of statements buffered before they are written out as a row group of each Parquet partition
+ROW_GROUP_SIZE = 100000
+
+# Columns with few distinct values, which are dictionary encoded in Parquet output. The congress isn't stored
+# in the files, it is the partition they are written to.
+PARQUET_DICTIONARY_COLUMNS = ['document', 'committee', 'subcommittee', 'title', 'date', 'name', 'state', 'role']
+PARQUET_COMPRESSION = 'zstd'
+
+# Number of statements inserted into SQLite output between commits of its transaction
+SQLITE_BATCH_SIZE = 10000
+
+# Tables and indexes of SQLite output. Statements refer to their document and speaker, statement_rows joins
+# them back into the rows of the other outputs.
+SQLITE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS documents (
+	id TEXT PRIMARY KEY,
+	congress INTEGER,
+	committee TEXT,
+	subcommittee TEXT,
+	title TEXT
+);
+CREATE TABLE IF NOT EXISTS participants (
+	id INTEGER PRIMARY KEY,
+	name TEXT,
+	state TEXT,
+	role TEXT,
+	UNIQUE (name, state, role)
+);
+CREATE TABLE IF NOT EXISTS statements (
+	id INTEGER PRIMARY KEY,
+	document TEXT REFERENCES documents (id),
+	date TEXT,
+	participant INTEGER REFERENCES participants (id),
+	text TEXT
+);
+CREATE INDEX IF NOT EXISTS documents_congress ON documents (congress, committee, subcommittee);
+CREATE INDEX IF NOT EXISTS documents_committee ON documents (committee, subcommittee);
+CREATE INDEX IF NOT EXISTS statements_document ON statements (document, date);
+CREATE INDEX IF NOT EXISTS statements_date ON statements (date);
+CREATE INDEX IF NOT EXISTS statements_participant ON statements (participant, date);
+CREATE INDEX IF NOT EXISTS participants_name ON participants (name);
+CREATE VIEW IF NOT EXISTS statement_rows AS
+	SELECT statements.id, documents.id AS document, documents.congress, documents.committee,
+		documents.subcommittee, documents.title, statements.date, participants.name, participants.state,
+		participants.role, statements.text
+	FROM statements JOIN documents ON documents.id = statements.document
+		JOIN participants ON participants.id = statements.participant;
+"""
+
+# Full-text index of statement text, kept up to date by triggers. Left out if SQLite was built without FTS5.
+SQLITE_FTS_SCHEMA = """
+CREATE VIRTUAL TABLE IF NOT EXISTS statements_fts USING fts5 (text, content='statements', content_rowid='id');
+CREATE TRIGGER IF NOT EXISTS statements_fts_insert AFTER INSERT ON statements BEGIN
+	INSERT INTO statements_fts (rowid, text) VALUES (new.id, new.text);
+END;
+CREATE TRIGGER IF NOT EXISTS statements_fts_delete AFTER DELETE ON statements BEGIN
+	INSERT INTO statements_fts (statements_fts, rowid, text) VALUES ('delete', old.id, old.text);
+END;
+"""
+
+
+# Files holding the questions queued by headless runs and the answers given to them during review
+REVIEW_QUEUE_FILE = 'review-queue.jsonl'
+REVIEW_RESOLUTIONS_FILE = 'review-resolutions.json'
+
+# Answers given to queued questions in headless mode. With 'skip', ambiguous lines are kept as part of the
+# current statement and unknown chairpersons left blank, with 'first' the first candidate match is taken.
+FALLBACK_POLICIES = ('skip', 'first')
+
+# Version of the metadata read from MODS files, metadata cached by other versions is read again
+METADATA_VERSION = 1
+
+# Version of the parsing rules, to be raised with any change to get_participant, process_hearing or the other
+# parsing functions that changes the rows, so that reprocessing rebuilds every document
+PARSER_VERSION = 1
+
+
+# Side-car files holding the phrases known not to introduce a speaker, speakers found in earlier documents,
+# manually entered chairpersons and the chairpersons of committees
+INVALID_SPEAKER_STRINGS_FILE = 'invalid-speaker-strings.txt'
+POSSIBLE_SPEAKERS_FILE = 'possible-speakers.csv'
+CHAIRS_FILE = 'chairs.csv'
+COMMITTEE_CHAIRS_FILE = 'committee-chairs.csv'
+
+# Seconds between writes of the side-car files while a run adds to them, they are always written when it ends
+STATE_FLUSH_INTERVAL = 60
 
 
 # Dictionaries of states
@@ -63,10 +243,16 @@ states = [
 	{'name': 'Puerto Rico', 'code': 'PR'}
 ]
 
+# Maps state codes to state names
+state_names = {state['code']: state['name'] for state in states}
+
 
 # Class to store data entries
 class Entry:
 
+	__slots__ = ('document', 'congress', 'committee', 'subcommittee', 'title', 'date', 'name', 'state', 'role', \
+		     'fragments')
+
 	def __init__(self, document_data=''):
 		if document_data != '':
 			self.document = document_data['id']
@@ -80,7 +266,8 @@ class Entry:
 			self.state = None
 			self.role = None
 
-			self.text = ''
+			# Paragraphs of the statement, each with the space that separates it from the previous one
+			self.fragments = []
 
 	def participant(self, participant_data):
 		self.name = participant_data['name']
@@ -93,7 +280,16 @@ class Entry:
 		self.role = role
 
 	def append_text(self, paragraph):
-		self.text += ' ' + paragraph
+		self.fragments.append(' ' + paragraph)
+
+	# Joins the paragraphs only when the text is needed, keeping the result for the next time
+	@property
+	def text(self):
+		if len(self.fragments) == 0:
+			return ''
+		if len(self.fragments) > 1:
+			self.fragments = [''.join(self.fragments)]
+		return self.fragments[0]
 
 	def data(self):
 		data = {'document': self.document, 'congress': self.congress, 'committee': self.committee, \
@@ -114,7 +310,11 @@ class Entry:
 # Class to track all data entries
 class Entries:
 
-	def __init__(self, entries=[]):
+	__slots__ = ('list', 'discard_flag')
+
+	def __init__(self, entries=None):
+		if entries is None:
+			entries = []
 		self.list = entries
 		self.discard_flag = True
 
@@ -135,6 +335,12 @@ class Entries:
 
 	def get(self):
 		return self.list
+
+	# Removes and returns the entries before the last one, which no paragraph can be added to anymore
+	def pop_closed(self):
+		closed = self.list[:-1]
+		del self.list[:-1]
+		return closed
 	
 	def clean(self):
 		for entry in self.list:
@@ -142,153 +348,1276 @@ class Entries:
 				del entry
 
 
-# Reads the API key from a txt file
+# Class to hold participants along with hash indexes of their last names, which are kept up to date as
+# participants are added. Each index maps a casefolded key to the positions of the matching participants.
+class ParticipantList(list):
+
+	def __init__(self, participants=()):
+		super().__init__()
+		self.by_ln = {}
+		self.by_last_token = {}
+		self.by_ln_state = {}
+
+		for participant in participants:
+			self.append(participant)
+
+	def append(self, participant):
+		position = len(self)
+		super().append(participant)
+
+		ln = participant['ln'].casefold()
+		self.by_ln.setdefault(ln, []).append(position)
+		if len(ln.split()) > 0:
+			self.by_last_token.setdefault(ln.split()[-1], []).append(position)
+		self.by_ln_state.setdefault((ln, participant['state'].casefold()), []).append(position)
+
+	def extend(self, participants):
+		for participant in participants:
+			self.append(participant)
+
+	# Returns the participants at the given positions, in the order they were added
+	def select(self, *positions):
+		return [self[i] for i in sorted(set().union(*positions))]
+
+	def copy(self):
+		return ParticipantList(self)
+
+	def __reduce__(self):
+		return (ParticipantList, (list(self),))
+
+
+# Class to hold the phrases known not to introduce a speaker, each a list of words
+# A phrase rules out lines starting with its first two words, and with its third word too when both have one
+class SpeakerStringList(list):
+
+	def __init__(self, strings=()):
+		super().__init__()
+		self.keys = set()
+		# First two words of the phrases of two words
+		self.pairs = set()
+		# Maps the first two words of longer phrases to their possible third words
+		self.triples = {}
+
+		for string in strings:
+			self.append(string)
+
+	def append(self, string):
+		super().append(string)
+		self.keys.add(tuple(string))
+
+		if len(string) == 2:
+			self.pairs.add(tuple(string))
+		elif len(string) > 2:
+			self.triples.setdefault((string[0], string[1]), set()).add(string[2])
+
+	def extend(self, strings):
+		for string in strings:
+			self.append(string)
+
+	def __contains__(self, string):
+		return tuple(string) in self.keys
+
+	# Checks whether the words of a line start with one of the phrases
+	def matches(self, words):
+		if len(words) < 2:
+			return False
+
+		start = (words[0], words[1])
+		if start in self.pairs:
+			return True
+		if start in self.triples:
+			return len(words) == 2 or words[2] in self.triples[start]
+		return False
+
+	def copy(self):
+		return SpeakerStringList(self)
+
+	def __reduce__(self):
+		return (SpeakerStringList, (list(self),))
+
+
+# Class to hold the chairpersons of documents keyed by document ID, along with an index of the chairpersons of
+# committees keyed by (congress, committee, subcommittee), so that once the chairperson of a committee is known
+# for a Congress, the other hearings of the committee are resolved without reading their heading or asking
+class ChairIndex(dict):
+
+	def __init__(self, chairs=(), committees=()):
+		super().__init__(chairs)
+		self.committees = dict(committees)
+
+	@staticmethod
+	def committee_key(data):
+		return (data['congress'], data['comm'], data['subcomm'])
+
+	# Returns the chairperson of the document of a hearing, or of its committee, {} if neither is known
+	def resolve(self, data):
+		if data['id'] in self:
+			return self[data['id']]
+		return self.committees.get(ChairIndex.committee_key(data), {})
+
+	# Records the chairperson of the committee of a hearing, the first one found is kept
+	def add_committee(self, data, chairperson):
+		self.committees.setdefault(ChairIndex.committee_key(data), chairperson)
+
+	def copy(self):
+		return ChairIndex(self, self.committees)
+
+	def __reduce__(self):
+		return (ChairIndex, (dict(self), self.committees))
+
+
+# Class to hold the state shared between documents: invalid speaker strings, possible speakers and the
+# chairpersons of documents and committees (see ChairIndex). The side-car files are read once, changes are
+# kept in memory and written back atomically every flush_interval seconds and when the store is flushed with
+# force.
+class StateStore:
+
+	def __init__(self, directory='.', flush_interval=STATE_FLUSH_INTERVAL, load=True):
+		self.directory = directory
+		self.flush_interval = flush_interval
+
+		self.lock = threading.RLock()
+		self.invalid_speaker_strings = SpeakerStringList()
+		self.possible_speakers = ParticipantList()
+		self.chairs = ChairIndex()
+
+		if load:
+			self.load()
+		self.saved = self.sizes()
+		self.flushed = time.monotonic()
+
+	def path(self, name):
+		return os.path.join(self.directory, name)
+
+	def load(self):
+		if os.path.exists(self.path(INVALID_SPEAKER_STRINGS_FILE)):
+			with open(self.path(INVALID_SPEAKER_STRINGS_FILE), 'r') as invalid_file:
+				for line in invalid_file:
+					if len(line.split()) > 0:
+						self.invalid_speaker_strings.append(line.split())
+
+		if os.path.exists(self.path(POSSIBLE_SPEAKERS_FILE)):
+			with open(self.path(POSSIBLE_SPEAKERS_FILE), 'r') as speakers_file:
+				for line in csv.DictReader(speakers_file):
+					self.possible_speakers.append(line)
+
+		if os.path.exists(self.path(CHAIRS_FILE)):
+			with open(self.path(CHAIRS_FILE), 'r') as chairs_file:
+				for line in csv.DictReader(chairs_file):
+					self.chairs[line['id']] = literal_eval(line['chair'])
+
+		if os.path.exists(self.path(COMMITTEE_CHAIRS_FILE)):
+			with open(self.path(COMMITTEE_CHAIRS_FILE), 'r') as committee_chairs_file:
+				for line in csv.DictReader(committee_chairs_file):
+					self.chairs.committees[(line['congress'], line['committee'], line['subcommittee'])] = \
+						literal_eval(line['chair'])
+
+	def sizes(self):
+		return (len(self.invalid_speaker_strings), len(self.possible_speakers), len(self.chairs), \
+			len(self.chairs.committees))
+
+	# Returns a copy that isn't backed by the files, for a document to add to on its own
+	def copy(self):
+		state = StateStore(self.directory, self.flush_interval, load=False)
+		with self.lock:
+			state.invalid_speaker_strings = self.invalid_speaker_strings.copy()
+			state.possible_speakers = self.possible_speakers.copy()
+			state.chairs = self.chairs.copy()
+		return state
+
+	# Returns what was added to a copy since it was made from original, along with the sizes of original
+	def additions(self, original):
+		return {'invalid_speaker_strings': self.invalid_speaker_strings[len(original.invalid_speaker_strings):], \
+			'possible_speakers': self.possible_speakers[len(original.possible_speakers):], \
+			'chairs': {id: chair for id, chair in self.chairs.items() if id not in original.chairs}, \
+			'committee_chairs': {key: chair for key, chair in self.chairs.committees.items() \
+					     if key not in original.chairs.committees}, \
+			'sizes': original.sizes()}
+
+	# Adds the state found by a copy, leaving out duplicates
+	def merge(self, additions):
+		with self.lock:
+			for string in additions['invalid_speaker_strings']:
+				if string not in self.invalid_speaker_strings:
+					self.invalid_speaker_strings.append(string)
+
+			names = {speaker['name'] for speaker in self.possible_speakers}
+			for speaker in additions['possible_speakers']:
+				if speaker['name'] not in names:
+					names.add(speaker['name'])
+					self.possible_speakers.append(speaker)
+
+			for id, chair in additions['chairs'].items():
+				self.chairs.setdefault(id, chair)
+			for key, chair in additions['committee_chairs'].items():
+				self.chairs.committees.setdefault(key, chair)
+
+	# Writes the files that changed, if flush_interval has passed since the last write or force is set
+	def flush(self, force=False):
+		with self.lock:
+			if not force and time.monotonic() - self.flushed < self.flush_interval:
+				return
+
+			sizes = self.sizes()
+			if sizes[0] != self.saved[0]:
+				self.write(INVALID_SPEAKER_STRINGS_FILE, \
+					   ''.join(' '.join(string) + '\n' for string in self.invalid_speaker_strings))
+			if sizes[1] != self.saved[1]:
+				self.write_csv(POSSIBLE_SPEAKERS_FILE, ['name', 'role', 'ln', 'state', 'state-code'], \
+					       self.possible_speakers)
+			if sizes[2] != self.saved[2]:
+				self.write_csv(CHAIRS_FILE, ['id', 'chair'], \
+					       [{'id': id, 'chair': chair} for id, chair in self.chairs.items()])
+			if sizes[3] != self.saved[3]:
+				self.write_csv(COMMITTEE_CHAIRS_FILE, ['congress', 'committee', 'subcommittee', 'chair'], \
+					       [{'congress': key[0], 'committee': key[1], 'subcommittee': key[2], 'chair': chair} \
+						for key, chair in self.chairs.committees.items()])
+
+			self.saved = sizes
+			self.flushed = time.monotonic()
+
+	# Replaces a file through a temporary file so that an interrupted write never leaves it truncated
+	def write(self, name, text):
+		temp_path = self.path(name) + '.tmp'
+		with open(temp_path, 'w', newline='') as f:
+			f.write(text)
+		os.replace(temp_path, self.path(name))
+
+	def write_csv(self, name, fieldnames, rows):
+		temp_path = self.path(name) + '.tmp'
+		with open(temp_path, 'w', newline='') as f:
+			writer = csv.DictWriter(f, fieldnames)
+			writer.writeheader()
+			for row in rows:
+				writer.writerow(row)
+		os.replace(temp_path, self.path(name))
+
+	def __getstate__(self):
+		state = self.__dict__.copy()
+		del state['lock']
+		return state
+
+	def __setstate__(self, state):
+		self.__dict__.update(state)
+		self.lock = threading.RLock()
+
+
+# State store used by the parser, loaded on first use
+state_store = None
+
+
+def get_state_store():
+	global state_store
+	if state_store is None:
+		state_store = StateStore()
+	return state_store
+
+
+# Class to keep downloaded pages on disk, keyed by document ID and link type
+# Pages are stored gzip compressed under their SHA-256 hash, which is checked again on every read
+class PageCache:
+
+	def __init__(self, directory=CACHE_DIRECTORY, size_limit=CACHE_SIZE_LIMIT, offline=False):
+		self.directory = directory
+		self.size_limit = size_limit
+		self.offline = offline
+
+		self.lock = threading.Lock()
+		self.unsaved = 0
+
+		# Maps '<document_id> <type>' to the hash, compressed size and last access time of the page
+		self.index = {}
+		# Maps each stored hash to [compressed size, number of keys referring to it]
+		self.objects = {}
+		self.size = 0
+
+		os.makedirs(os.path.join(self.directory, 'objects'), exist_ok=True)
+		if os.path.exists(self.index_path()):
+			with open(self.index_path(), 'r') as index_file:
+				self.index = json.load(index_file)
+			for record in self.index.values():
+				self.reference(record['hash'], record['size'])
+
+	def index_path(self):
+		return os.path.join(self.directory, 'index.json')
+
+	def object_path(self, digest):
+		return os.path.join(self.directory, 'objects', digest[:2], digest + '.gz')
+
+	def key(self, document_id, type):
+		return '{} {}'.format(document_id, type)
+
+	def reference(self, digest, size):
+		if digest in self.objects:
+			self.objects[digest][1] += 1
+		else:
+			self.objects[digest] = [size, 1]
+			self.size += size
+
+	# Drops a key from the index, deleting its page once no other key refers to it
+	def release(self, key):
+		record = self.index.pop(key)
+		self.objects[record['hash']][1] -= 1
+		if self.objects[record['hash']][1] == 0:
+			del self.objects[record['hash']]
+			self.size -= record['size']
+			try:
+				os.remove(self.object_path(record['hash']))
+			except FileNotFoundError:
+				pass
+
+	# Returns the cached page, or None if it is missing or fails its integrity check
+	def get(self, document_id, type):
+		key = self.key(document_id, type)
+		with self.lock:
+			record = self.index.get(key)
+		if record is None:
+			return None
+
+		try:
+			with open(self.object_path(record['hash']), 'rb') as object_file:
+				data = gzip.decompress(object_file.read())
+		except (OSError, EOFError):
+			data = None
+
+		if data is None or hashlib.sha256(data).hexdigest() != record['hash']:
+			print("WARNING: Discarding corrupt cached page for {} ({})".format(document_id, type))
+			with self.lock:
+				if key in self.index:
+					self.release(key)
+			return None
+
+		with self.lock:
+			record['accessed'] = time.time()
+		return data
+
+	def put(self, document_id, type, data):
+		key = self.key(document_id, type)
+		digest = hashlib.sha256(data).hexdigest()
+		path = self.object_path(digest)
+
+		# Write to a temporary file first so that an interrupted run never leaves a truncated page
+		if not os.path.exists(path):
+			os.makedirs(os.path.dirname(path), exist_ok=True)
+			temp_path = '{}.{}.tmp'.format(path, threading.get_ident())
+			with open(temp_path, 'wb') as object_file:
+				object_file.write(gzip.compress(data))
+			os.replace(temp_path, path)
+		size = os.path.getsize(path)
+
+		with self.lock:
+			if key in self.index:
+				self.release(key)
+			self.index[key] = {'hash': digest, 'size': size, 'accessed': time.time()}
+			self.reference(digest, size)
+
+			if self.size > self.size_limit:
+				self.evict()
+
+			self.unsaved += 1
+			if self.unsaved >= CACHE_SAVE_INTERVAL:
+				self.save()
+
+	# Removes the least recently used pages until the cache is back under 90% of its size limit
+	def evict(self):
+		for key in sorted(self.index, key=lambda key: self.index[key]['accessed']):
+			if self.size <= 0.9 * self.size_limit:
+				break
+			self.release(key)
+
+	def save(self):
+		temp_path = self.index_path() + '.tmp'
+		with open(temp_path, 'w') as index_file:
+			json.dump(self.index, index_file)
+		os.replace(temp_path, self.index_path())
+		self.unsaved = 0
+
+	def close(self):
+		with self.lock:
+			self.save()
+
+
+# Cache consulted by get_page before downloading, None to always download
+page_cache = None
+
+
+# Memory mapping of a file that zipfile can read a ZIP through, which needs the mapping to say it's seekable
+class MappedFile(mmap.mmap):
+
+	def seekable(self):
+		return True
+
+
+# Class to read the MODS and HTML pages of documents from govinfo package ZIPs, or directories of them, in
+# place of downloading them. A package is a directory named after the document ID at the top of a ZIP, holding
+# mods.xml and html/<document ID>.htm. The ZIPs are indexed when the archive is created, and are memory-mapped
+# and read without extracting them when their pages are needed, keeping the most recently used ones open.
+class PackageArchive:
+
+	def __init__(self, paths, open_limit=PACKAGE_ARCHIVES_OPEN):
+		self.open_limit = open_limit
+		self.lock = threading.Lock()
+
+		# Maps each document ID to the (ZIP path, member name) of its pages by type
+		self.members = {}
+		# Maps the paths of the open ZIPs to their (mapping, ZipFile), least recently used first
+		self.archives = {}
+
+		for path in paths:
+			if os.path.isdir(path):
+				for directory, _, names in sorted(os.walk(path)):
+					for name in sorted(names):
+						if name.lower().endswith('.zip'):
+							self.index(os.path.join(directory, name))
+			else:
+				self.index(path)
+
+	def index(self, path):
+		try:
+			with zipfile.ZipFile(path) as archive:
+				names = archive.namelist()
+		except (OSError, zipfile.BadZipFile) as e:
+			print("WARNING: Unable to read package ZIP {}: {}".format(path, e))
+			return
+
+		for name in names:
+			parts = name.split('/')
+			if len(parts) < 2:
+				continue
+			if parts[-1].lower() == 'mods.xml':
+				type = 'mods'
+			elif parts[-2].lower() == 'html' and parts[-1].lower().endswith(('.htm', '.html')):
+				type = 'html'
+			else:
+				continue
+			self.members.setdefault(parts[0], {})[type] = (path, name)
+
+	def ids(self):
+		return list(self.members)
+
+	def archive(self, path):
+		if path in self.archives:
+			self.archives[path] = self.archives.pop(path)
+			return self.archives[path][1]
+
+		if len(self.archives) >= self.open_limit:
+			self.close_archive(next(iter(self.archives)))
+		with open(path, 'rb') as f:
+			mapping = MappedFile(f.fileno(), 0, access=mmap.ACCESS_READ)
+		self.archives[path] = (mapping, zipfile.ZipFile(mapping))
+		return self.archives[path][1]
+
+	def close_archive(self, path):
+		mapping, archive = self.archives.pop(path)
+		archive.close()
+		mapping.close()
+
+	# Returns the page of the given type of a document, or a FetchFailure if no package has it
+	def get(self, document_id, type='html'):
+		if type not in self.members.get(document_id, {}):
+			return FetchFailure(create_page_url(document_id, type), reason='not in the package ZIPs')
+
+		path, name = self.members[document_id][type]
+		with self.lock:
+			try:
+				data = self.archive(path).read(name)
+			except (OSError, ValueError, zipfile.BadZipFile) as e:
+				return FetchFailure('{}/{}'.format(path, name), reason=str(e))
+
+		metrics.count('bytes_read', document_id, len(data))
+		return data
+
+	def close(self):
+		with self.lock:
+			while len(self.archives) > 0:
+				self.close_archive(next(iter(self.archives)))
+
+
+# Package ZIPs get_page reads pages from instead of the page cache or the network, None to download them
+page_source = None
+
+
+# Class to record the outcome of every document in a batch run, so that an interrupted run can be resumed
+# Records are appended to a JSON lines file as each document finishes, the last record for an ID wins
+class Manifest:
+
+	COMPLETED = 'completed'
+	FAILED = 'failed'
+	SKIPPED = 'skipped'
+
+	def __init__(self, path, fresh=True):
+		self.path = path
+		self.records = {}
+		self.last_offset = None
+
+		if not fresh and os.path.exists(path):
+			with open(path, 'r', encoding='utf-8') as manifest_file:
+				for line in manifest_file:
+					try:
+						record = json.loads(line)
+					except json.JSONDecodeError: # Line cut short by a crash
+						continue
+					self.records[record['id']] = record
+					self.last_offset = record.get('offset', self.last_offset)
+
+		self.file = open(path, 'w' if fresh else 'a', encoding='utf-8')
+
+	def status(self, document_id):
+		if document_id in self.records:
+			return self.records[document_id]['status']
+		return None
+
+	def ids(self, status):
+		return [id for id, record in self.records.items() if record['status'] == status]
+
+	# Size of the output file after the last recorded document was written
+	def offset(self):
+		return self.last_offset
+
+	def record(self, document_id, status, **details):
+		record = {'id': document_id, 'status': status, \
+			  'time': datetime.datetime.now().isoformat(timespec='seconds')}
+		record.update(details)
+		self.records[document_id] = record
+		self.last_offset = record.get('offset', self.last_offset)
+
+		self.file.write(json.dumps(record) + '\n')
+		self.file.flush()
+		os.fsync(self.file.fileno())
+
+	def close(self):
+		self.file.close()
+
+
+# Returns the path of the manifest kept next to the given output file
+def manifest_path(output_file):
+	return os.path.splitext(output_file)[0] + '-manifest.jsonl'
+
+
+# Class to queue the questions raised while parsing in headless mode, and hold the answers given in review
+# Questions are keyed by document, hearing date, paragraph offset and kind, so that the answer is found
+# again when the document is processed after the review
+class ReviewQueue:
+
+	def __init__(self, path=REVIEW_QUEUE_FILE, resolutions_path=REVIEW_RESOLUTIONS_FILE):
+		self.path = path
+		self.resolutions_path = resolutions_path
+		self.resolutions = {}
+
+		# Questions raised by this process that haven't been written to the queue file yet
+		self.items = []
+		self.location = {'document': '', 'date': '', 'offset': 0}
+
+	def load_resolutions(self):
+		if os.path.exists(self.resolutions_path):
+			with open(self.resolutions_path, 'r', encoding='utf-8') as resolutions_file:
+				self.resolutions = json.load(resolutions_file)
+
+	# Sets the paragraph questions are being raised for
+	def locate(self, document_id, date, offset):
+		self.location = {'document': document_id, 'date': date, 'offset': offset}
+
+	# Questions about a whole document, like who its chairperson is, leave out the paragraph offset
+	def key(self, kind, subject='', per_document=False):
+		offset = '' if per_document else self.location['offset']
+		return '{} {} {} {} {}'.format(self.location['document'], self.location['date'], offset, kind, subject)
+
+	def add(self, key, kind, paragraph, candidates):
+		if any(item['key'] == key for item in self.items):
+			return
+		item = {'key': key, 'kind': kind, 'paragraph': paragraph, 'candidates': candidates}
+		item.update(self.location)
+		self.items.append(item)
+
+	# Returns and forgets the questions raised since the last call
+	def drain(self):
+		items = self.items
+		self.items = []
+		return items
+
+	def read(self):
+		items = []
+		if os.path.exists(self.path):
+			with open(self.path, 'r', encoding='utf-8') as queue_file:
+				for line in queue_file:
+					try:
+						items.append(json.loads(line))
+					except json.JSONDecodeError:
+						continue
+		return items
+
+	# Adds questions to the queue file, leaving out those already queued
+	def append(self, items):
+		if len(items) == 0:
+			return
+		queued = {item['key'] for item in self.read()}
+		with open(self.path, 'a', encoding='utf-8') as queue_file:
+			for item in items:
+				if item['key'] not in queued:
+					queue_file.write(json.dumps(item) + '\n')
+
+	def rewrite(self, items):
+		temp_path = self.path + '.tmp'
+		with open(temp_path, 'w', encoding='utf-8') as queue_file:
+			for item in items:
+				queue_file.write(json.dumps(item) + '\n')
+		os.replace(temp_path, self.path)
+
+	# Records the answer to a question, saving after every answer so that a review can be interrupted
+	def resolve(self, key, resolution):
+		self.resolutions[key] = resolution
+
+		temp_path = self.resolutions_path + '.tmp'
+		with open(temp_path, 'w', encoding='utf-8') as resolutions_file:
+			json.dump(self.resolutions, resolutions_file, indent=1)
+		os.replace(temp_path, self.resolutions_path)
+
+
+# Whether questions about ambiguous speakers are asked as they come up, or queued for review (headless mode)
+interactive = True
+
+# Answer used in headless mode for questions that haven't been reviewed yet, one of FALLBACK_POLICIES
+fallback_policy = 'skip'
+
+# Questions queued in headless mode along with the answers from earlier reviews
+review_queue = ReviewQueue()
+
+
+# Class to time a block of code as a stage of the pipeline, see Metrics.span
+class Span:
+
+	__slots__ = ('metrics', 'stage', 'document_id', 'start')
+
+	def __init__(self, metrics, stage, document_id):
+		self.metrics = metrics
+		self.stage = stage
+		self.document_id = document_id
+
+	def __enter__(self):
+		self.start = time.perf_counter()
+		return self
+
+	def __exit__(self, *exception):
+		self.metrics.record(self.stage, self.document_id, time.perf_counter() - self.start)
+		return False
+
+
+# Class to collect the time spent in each stage of the pipeline and counters of what was processed, both per
+# document and for the whole run. Each document's summary is written as a JSON line when it finishes and the
+# totals when the run ends, or only the totals in the Prometheus text format. Without a path nothing is
+# written, which is how worker processes collect the summaries they send back with their rows.
+class Metrics:
+
+	FORMATS = ('jsonl', 'prometheus')
+
+	def __init__(self, path=None, format='jsonl'):
+		self.path = path
+		self.format = format
+
+		self.lock = threading.Lock()
+		self.documents = {}
+		self.totals = Metrics.summary()
+		self.statuses = {}
+		self.slowest = []
+
+		self.file = None
+		if path is not None and format == 'jsonl':
+			self.file = open(path, 'w', encoding='utf-8')
+
+	@staticmethod
+	def summary():
+		return {'seconds': {}, 'calls': {}, 'counters': {}}
+
+	def document(self, document_id):
+		if document_id not in self.documents:
+			self.documents[document_id] = Metrics.summary()
+		return self.documents[document_id]
+
+	def record(self, stage, document_id, seconds, calls=1):
+		with self.lock:
+			for summary in (self.document(document_id), self.totals):
+				summary['seconds'][stage] = summary['seconds'].get(stage, 0) + seconds
+				summary['calls'][stage] = summary['calls'].get(stage, 0) + calls
+
+	def count(self, counter, document_id, amount=1):
+		with self.lock:
+			for summary in (self.document(document_id), self.totals):
+				summary['counters'][counter] = summary['counters'].get(counter, 0) + amount
+
+	# Returns a context manager timing the block it wraps
+	def span(self, stage, document_id):
+		return Span(self, stage, document_id)
+
+	# Yields the items of an iterable, timing only the time spent producing them and not the time the
+	# consumer spends on them in between
+	def timed(self, stage, document_id, iterable):
+		iterator = iter(iterable)
+		elapsed = 0
+		try:
+			while True:
+				start = time.perf_counter()
+				try:
+					item = next(iterator)
+				except StopIteration:
+					return
+				finally:
+					elapsed += time.perf_counter() - start
+				yield item
+		finally:
+			self.record(stage, document_id, elapsed)
+
+	# Removes and returns the summary of a document, which is empty if nothing was recorded for it
+	def take(self, document_id):
+		with self.lock:
+			return self.documents.pop(document_id, Metrics.summary())
+
+	# Adds a summary taken from another process to the summary of the document and the totals
+	def merge(self, document_id, summary):
+		with self.lock:
+			for merged in (self.document(document_id), self.totals):
+				for kind in ('seconds', 'calls', 'counters'):
+					for name, value in summary[kind].items():
+						merged[kind][name] = merged[kind].get(name, 0) + value
+
+	# Ends the summary of a document, writing it as a JSON line
+	def finish(self, document_id, status):
+		summary = self.take(document_id)
+		seconds = sum(summary['seconds'].values())
+		with self.lock:
+			self.statuses[status] = self.statuses.get(status, 0) + 1
+			self.slowest = sorted(self.slowest + [(seconds, document_id)], reverse=True)[:5]
+			if self.file is not None:
+				self.file.write(json.dumps({'document': document_id, 'status': status, \
+					'seconds': round(seconds, 6), 'stages': Metrics.rounded(summary['seconds']), \
+					'counters': summary['counters']}) + '\n')
+				self.file.flush()
+
+	@staticmethod
+	def rounded(seconds):
+		return {stage: round(value, 6) for stage, value in seconds.items()}
+
+	def prometheus(self):
+		lines = ['# HELP hearing_stage_seconds_total Time spent in each stage of the pipeline', \
+			 '# TYPE hearing_stage_seconds_total counter']
+		lines += ['hearing_stage_seconds_total{{stage="{}"}} {:.6f}'.format(stage, seconds) \
+			  for stage, seconds in sorted(self.totals['seconds'].items())]
+		lines += ['# HELP hearing_stage_calls_total Number of times each stage of the pipeline ran', \
+			  '# TYPE hearing_stage_calls_total counter']
+		lines += ['hearing_stage_calls_total{{stage="{}"}} {}'.format(stage, calls) \
+			  for stage, calls in sorted(self.totals['calls'].items())]
+		lines += ['# HELP hearing_documents_total Number of documents processed by outcome', \
+			  '# TYPE hearing_documents_total counter']
+		lines += ['hearing_documents_total{{status="{}"}} {}'.format(status, count) \
+			  for status, count in sorted(self.statuses.items())]
+		for counter, value in sorted(self.totals['counters'].items()):
+			lines += ['# TYPE hearing_{}_total counter'.format(counter), 'hearing_{}_total {}'.format(counter, value)]
+
+		return '\n'.join(lines) + '\n'
+
+	# Writes the totals of the run and prints the slowest documents
+	def close(self):
+		if self.file is not None:
+			self.file.write(json.dumps({'totals': {'documents': self.statuses, \
+				'stages': Metrics.rounded(self.totals['seconds']), 'calls': self.totals['calls'], \
+				'counters': self.totals['counters']}}) + '\n')
+			self.file.close()
+			self.file = None
+		elif self.path is not None:
+			temp_path = self.path + '.tmp'
+			with open(temp_path, 'w', encoding='utf-8') as metrics_file:
+				metrics_file.write(self.prometheus())
+			os.replace(temp_path, self.path)
+
+		if len(self.slowest) > 0:
+			print("Slowest documents: {}".format(', '.join('{} ({:.2f}s)'.format(document_id, seconds) \
+				for seconds, document_id in self.slowest)))
+
+
+# Stands in for Metrics when instrumentation is off, doing as little as possible at every call
+class NullMetrics:
+
+	def record(self, stage, document_id, seconds, calls=1):
+		pass
+
+	def count(self, counter, document_id, amount=1):
+		pass
+
+	def span(self, stage, document_id):
+		return self
+
+	def __enter__(self):
+		return self
+
+	def __exit__(self, *exception):
+		return False
+
+	def timed(self, stage, document_id, iterable):
+		return iterable
+
+	def take(self, document_id):
+		return None
+
+	def merge(self, document_id, summary):
+		pass
+
+	def finish(self, document_id, status):
+		pass
+
+	def close(self):
+		pass
+
+
+# Instrumentation of the pipeline, a Metrics when it's turned on
+metrics = NullMetrics()
+
+
+# Class to describe a request that could not be completed, returned in place of the response
+class FetchFailure:
+
+	def __init__(self, url, status=None, reason='', attempts=0):
+		self.url = url
+		self.status = status
+		self.reason = reason
+		self.attempts = attempts
+
+	def data(self):
+		return {'url': self.url, 'status': self.status, 'reason': self.reason, 'attempts': self.attempts}
+
+	def __str__(self):
+		if self.status is None:
+			return "{} ({} attempts)".format(self.reason, self.attempts)
+		return "{} {} ({} attempts)".format(self.status, self.reason, self.attempts)
+
+
+# Class to limit the rate of requests to a host with a token bucket shared by all threads
+class RateLimiter:
+
+	def __init__(self, rate, burst=1):
+		self.rate = rate
+		self.burst = burst
+		self.tokens = burst
+		self.updated = time.monotonic()
+		self.paused_until = 0
+		self.lock = threading.Lock()
+
+	# Blocks until a request may be made
+	def acquire(self):
+		while True:
+			with self.lock:
+				now = time.monotonic()
+				self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+				self.updated = now
+
+				if now >= self.paused_until and self.tokens >= 1:
+					self.tokens -= 1
+					return
+				wait = max(self.paused_until - now, (1 - self.tokens) / self.rate)
+
+			time.sleep(wait)
+
+	# Stops all requests to the host for the given number of seconds, e.g. after being throttled
+	def pause(self, seconds):
+		with self.lock:
+			self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+			self.tokens = 0
+
+
+# Creates a rate limiter for each host in rate_limits
+def create_rate_limiters(rate_limits=RATE_LIMITS):
+	return {host: RateLimiter(rate, burst) for host, (rate, burst) in rate_limits.items()}
+
+
+# Rate limiters of the hosts requests are limited for, keyed by host name
+rate_limiters = create_rate_limiters()
+
+
+# Returns the number of seconds a response asks to wait before retrying, or None if it doesn't say
+def get_retry_after(response):
+	retry_after = response.headers.get('Retry-After')
+	if retry_after is None:
+		return None
+
+	if retry_after.strip().isdigit():
+		return int(retry_after)
+	try:
+		date = email.utils.parsedate_to_datetime(retry_after)
+	except (TypeError, ValueError, IndexError):
+		return None
+	# HTTP dates are in GMT, a date without a zone or with -0000 is read as naive
+	if date.tzinfo is None:
+		date = date.replace(tzinfo=datetime.timezone.utc)
+	return max(0, (date - datetime.datetime.now(datetime.timezone.utc)).total_seconds())
+
+
+# Requests a url, retrying throttled requests, server errors and connection errors with exponential
+# backoff and jitter, and returns the response or a FetchFailure once every attempt has failed
+def fetch(url):
+	limiter = rate_limiters.get(urllib.parse.urlsplit(url).hostname)
+
+	for attempt in range(1, MAX_ATTEMPTS + 1):
+		if limiter is not None:
+			limiter.acquire()
+
+		delay = random.uniform(0, min(BACKOFF_MAX, BACKOFF_BASE * 2 ** (attempt - 1)))
+		try:
+			response = session.get(url, timeout=REQUEST_TIMEOUT)
+		except requests.RequestException as e:
+			failure = FetchFailure(url, reason=str(e), attempts=attempt)
+		else:
+			if response.status_code == 200:
+				return response
+
+			failure = FetchFailure(url, response.status_code, response.reason, attempt)
+			retry_after = get_retry_after(response)
+			response.close()
+			if response.status_code not in RETRY_STATUSES:
+				return failure
+
+			# Back every thread off the host when throttled
+			if retry_after is not None:
+				delay = min(retry_after, BACKOFF_MAX)
+			if response.status_code == 429 and limiter is not None:
+				limiter.pause(delay)
+
+		if attempt < MAX_ATTEMPTS:
+			time.sleep(delay)
+
+	return failure
+
+
+# Creates a keep-alive session that keeps up to pool_size connections open to each host
+def create_session(pool_size=POOL_SIZE):
+	session = requests.Session()
+	session.headers.update(HEADERS)
+
+	adapter = requests.adapters.HTTPAdapter(pool_connections=POOL_HOSTS, pool_maxsize=pool_size)
+	session.mount('https://', adapter)
+	session.mount('http://', adapter)
+
+	return session
+
+
+# Session shared by every request so that connections are reused between documents
+session = create_session()
+
+
+# Reads the API key from a txt file, only once per process
+@functools.cache
 def get_api_key():
 	with open('API Key.txt', mode='r') as f:
-		api_key = f.read()
+		api_key = f.read().strip()
 
 	return api_key
 
 
 # Creates a url returning a list of documents for the specified Congress
-def create_list_url(congress, offset_mark='%2A'):
+# Only packages modified since last_modified (a UTC timestamp like 2017-01-01T00:00:00Z) are listed
+def create_list_url(congress, offset_mark='%2A', last_modified=LIST_START_DATE):
 	api_key = get_api_key()
 
-	url = "https://api.govinfo.gov/collections/CHRG/2017-01-01T00%3A00%3A00Z?pageSize=1000&congress={}\
-		&docClass=hhrg&offsetMark={}&api_key={}".format(congress, offset_mark, api_key)
+	url = GOVINFO_LIST_URL.format(urllib.parse.quote(last_modified), congress, offset_mark, api_key)
 
 	return url
 
 
 # Makes a request to a given URL and returns the result
 def make_request(url):
-	response = requests.get(url)
+	response = fetch(url)
 
-	print(response.status_code)
-	if response.status_code != 200:
-		raise Exception(
-			"Request returned an error: {} {}".format(response.status_code, response.text)
-		)
+	if isinstance(response, FetchFailure):
+		raise Exception("Request returned an error: {}".format(response))
 	else:
-		return response.json()
+		with response:
+			return response.json()
 
 
-# Requests a list of document IDs and returns it
-def get_list(congress):
-	documents = list()
+# Requests every package of a Congress modified since last_modified and returns the package records
+# The collections service pages with an offset mark, so the pages have to be requested one after another
+def request_packages(congress, last_modified=LIST_START_DATE):
+	packages = list()
 
-	url = create_list_url(congress)
-	json = make_request(url)
-	
-	for package in json['packages']:
-		documents.append(package['packageId'])
+	url = create_list_url(congress, last_modified=last_modified)
+	results = make_request(url)
+	packages += results['packages']
 
-	api_key = get_api_key()
-	while json['nextPage'] != None:
-		url = "{}&api_key={}".format(json['nextPage'], api_key)
-		json = make_request(url)
+	while results['nextPage'] != None:
+		url = "{}&api_key={}".format(results['nextPage'], get_api_key())
+		results = make_request(url)
+		packages += results['packages']
 
-		for package in json['packages']:
-			documents.append(package['packageId'])
+	return packages
 
-	return documents
 
+# Returns the path of the cached listing for the given Congress
+def listing_path(congress):
+	return os.path.join(LISTING_DIRECTORY, 'CHRG-{}.json'.format(congress))
 
-# Returns the corresponding document for the given ID and document type
-def get_page(document_id, type='html'):
+
+# Requests a list of document IDs and returns it
+# Listings are cached along with the time they were fetched and reused unless refresh is set. With
+# incremental, only the packages modified since the cached listing are requested, and only their IDs returned.
+def get_list(congress, incremental=False, refresh=False):
+	listing = None
+	if not refresh and os.path.exists(listing_path(congress)):
+		with open(listing_path(congress), 'r') as listing_file:
+			listing = json.load(listing_file)
+
+	if listing is not None and not incremental:
+		return [package['packageId'] for package in listing['packages']]
+
+	# Take the timestamp first so that packages modified while listing are picked up next time
+	fetched = datetime.datetime.now(datetime.timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ')
+
+	if listing is None:
+		packages = request_packages(congress)
+		listing = {'congress': congress, 'packages': packages}
+	else:
+		packages = request_packages(congress, listing['fetched'])
+		updated = {package['packageId'] for package in packages}
+		listing['packages'] = [package for package in listing['packages'] if package['packageId'] not in updated]
+		listing['packages'] += packages
+	listing['fetched'] = fetched
+
+	os.makedirs(LISTING_DIRECTORY, exist_ok=True)
+	temp_path = listing_path(congress) + '.tmp'
+	with open(temp_path, 'w') as listing_file:
+		json.dump(listing, listing_file)
+	os.replace(temp_path, listing_path(congress))
+
+	return [package['packageId'] for package in packages]
+
+
+# Creates the link service url for the given document ID and document type
+def create_page_url(document_id, type='html'):
 	congress = document_id[5:8]
 	id = "{}-{}".format(document_id[-5:-3], document_id[-3:])
 
-	url = "https://www.govinfo.gov/link/chrg/{}/{}?link-type={}".format(congress, id, type)
-
-	response = requests.get(url, allow_redirects=True, stream=True)
+	return GOVINFO_LINK_URL.format(congress, id, type)
 
-	if response.status_code != 200:
-		print('Response status code: ' + str(response.status_code))
-		print("Couldn't read document {}".format(document_id))
-		return None
-	else:
-		headers = {"User-Agent": "Mozilla/5.0 (Windows NT 10.0; WOW64) \
-					AppleWebKit/537.36 (KHTML, like Gecko) Chrome/47.0.2526.106 Safari/537.36"}
-		req = urllib.request.Request(response.url, headers=headers)
-		with urllib.request.urlopen(req) as f:
-			data = f.read()
 
-		return data
+# Returns the corresponding document for the given ID and document type, or a FetchFailure
+def get_page(document_id, type='html'):
+	if page_source is not None:
+		return page_source.get(document_id, type)
+
+	url = create_page_url(document_id, type)
+
+	if page_cache is not None:
+		data = page_cache.get(document_id, type)
+		if data is not None:
+			metrics.count('cache_hits', document_id)
+			return data
+		elif page_cache.offline:
+			print("Couldn't read document {}: {} page is not cached and running offline".format(document_id, type))
+			return FetchFailure(url, reason='not cached while offline')
+
+	# Follows the redirect to the document and reads the body over the same connection
+	response = fetch(url)
+	if isinstance(response, FetchFailure):
+		print("Couldn't read document {}: {}".format(document_id, response))
+		return response
+
+	try:
+		with response:
+			data = response.content
+	except requests.RequestException as e:
+		print("Couldn't read document {}: {}".format(document_id, e))
+		return FetchFailure(url, reason=str(e), attempts=1)
+	metrics.count('bytes_fetched', document_id, len(data))
+
+	if page_cache is not None:
+		page_cache.put(document_id, type, data)
+
+	return data
+
+
+# Returns a hash of the MODS and HTML pages of a document
+def input_digest(mods, html):
+	digest = hashlib.sha256()
+	for page in (mods, html):
+		digest.update(hashlib.sha256(page).digest())
+	return digest.hexdigest()
+
+
+# Returns the page of the given type of a document like get_page, with an unexpected error returned as a
+# FetchFailure so that it only fails that document
+def fetch_page(document_id, type='html'):
+	try:
+		return get_page(document_id, type=type)
+	except Exception as e:
+		print("Couldn't read document {}: {}".format(document_id, e))
+		return FetchFailure(create_page_url(document_id, type), reason=str(e) or e.__class__.__name__)
+
+
+# Downloads both the MODS and HTML pages for the given document ID
+def fetch_document(document_id):
+	with metrics.span('get_page', document_id):
+		mods = fetch_page(document_id, type='mods')
+		html = fetch_page(document_id)
+
+	return mods, html
+
+
+# Downloads documents on a pool of worker threads, staying up to lookahead documents ahead of the
+# consumer, and yields (document_id, mods, html) in the same order as the given IDs
+def prefetch_documents(ids, concurrency=FETCH_CONCURRENCY, lookahead=None):
+	if lookahead is None:
+		lookahead = 2 * concurrency
+
+	pending = deque()
+	executor = ThreadPoolExecutor(max_workers=max(concurrency, 1))
+	try:
+		for id in ids:
+			pending.append((id, executor.submit(fetch_document, id)))
+			if len(pending) > lookahead:
+				document_id, future = pending.popleft()
+				yield (document_id, *future.result())
+
+		while len(pending) > 0:
+			document_id, future = pending.popleft()
+			yield (document_id, *future.result())
+	finally:
+		executor.shutdown(cancel_futures=True)
 	
 
-# Extracts data from XML files corresponding to the given document ID
-def process_xml_file(document_id):
-	PREFIX = '{http://www.loc.gov/mods/v3}'
+# Class to hold the metadata of a document read from its MODS file
+class DocumentMetadata:
+
+	__slots__ = ('document_id', 'congress', 'title', 'committee', 'subcommittee', 'dates', 'participants')
+
+	def __init__(self, document_id, congress='', title='', committee='', subcommittee='', dates=None, \
+		     participants=None):
+		self.document_id = document_id
+		self.congress = congress
+		self.title = title
+		self.committee = committee
+		self.subcommittee = subcommittee
+		self.dates = dates if dates is not None else []
+		self.participants = participants if participants is not None else []
+
+	# Returns the data of each hearing of the document
+	def data(self):
+		return [{'id': self.document_id, 'congress': self.congress, 'title': self.title, 'date': date, \
+			 'comm': self.committee, 'subcomm': self.subcommittee} for date in self.dates]
+
+	# Returns the metadata as a record to cache, along with the hash of the MODS file it was read from
+	def record(self, source):
+		record = {name: getattr(self, name) for name in self.__slots__}
+		record.update({'version': METADATA_VERSION, 'source': source})
+		return record
 
-	congress = title = committee = subcommittee = ''
-	participants = []
-	dates = []
-	data = []
+	@staticmethod
+	def from_record(record):
+		return DocumentMetadata(*(record[name] for name in DocumentMetadata.__slots__))
 
-	page = get_page(document_id, type='mods')
-	root = xml.fromstring(page)
 
-	for child in root:
+# Reads the metadata of a document from its MODS file as the elements are parsed, clearing them as it goes
+def parse_mods(document_id, page):
+	PREFIX = '{http://www.loc.gov/mods/v3}'
+
+	metadata = DocumentMetadata(document_id)
+	parents = []
+	for event, element in xml.iterparse(io.BytesIO(page), events=('start', 'end')):
+		if event == 'start':
+			parents.append(element.tag)
+			continue
+		parents.pop()
 
 		# Get title of document
-		if child.tag == PREFIX + 'titleInfo' and len(child) > 0:
-			title = child[0].text
-
-		elif child.tag == PREFIX + 'extension':
-			for detail in child:
-
-				name = role = last_name = state = state_code = ''
-
-				# Get congress
-				if detail.tag == PREFIX + 'congress':
-					congress = detail.text
-
-				# Get date
-				if detail.tag == PREFIX + 'heldDate':
-					dates.append(detail.text)
-
-				# Get committee data
-				elif detail.tag == PREFIX + 'congCommittee':
-					for comm in detail:
-						if comm.tag == PREFIX + 'name' and \
-							comm.attrib['type'] == 'authority-standard':
-							committee = comm.text
-						elif comm.tag == PREFIX + 'subCommittee':
-							subcommittee = comm[0].text
-
-				# Get witnesses
-				elif detail.tag == PREFIX + 'witness':
-					name = detail.text
-					role = 'witness'
-					last_name = name[:name.find(',')]
-					names = last_name.split()
-					if len(names) > 1:
-						last_name = names[-1]
-
-					participants.append({'name': name, 'role': role, \
-										 'ln': last_name, 'state': state, 'state-code': state_code})
-
-				# Get Congresspersons
-				elif detail.tag == PREFIX + 'congMember':
-					role = 'member'
-					state_code = detail.attrib['state']
-					for st in states:
-						if st['code'] == state_code:
-							state = st['name']
-					for nametag in detail:
-						if nametag.attrib['type'] == 'authority-lnf':
-							name = nametag.text
-							last_name = nametag.text[:nametag.text.find(',')]
-
-					participants.append({'name': name, 'role': role, \
-										 'ln': last_name, 'state': state, 'state-code': state_code})
-
-	for date in dates:
-		data.append({'id': document_id, 'congress': congress, 'title': title, 'date': date, \
-				'comm': committee, 'subcomm': subcommittee})
-
-	return data, participants
+		if len(parents) == 1 and element.tag == PREFIX + 'titleInfo' and len(element) > 0:
+			metadata.title = element[0].text
+
+		elif len(parents) == 2 and parents[1] == PREFIX + 'extension':
+			detail = element
+
+			# Get congress
+			if detail.tag == PREFIX + 'congress':
+				metadata.congress = detail.text
+
+			# Get date
+			elif detail.tag == PREFIX + 'heldDate':
+				metadata.dates.append(detail.text)
+
+			# Get committee data
+			elif detail.tag == PREFIX + 'congCommittee':
+				for comm in detail:
+					if comm.tag == PREFIX + 'name' and comm.get('type') == 'authority-standard':
+						metadata.committee = comm.text
+					elif comm.tag == PREFIX + 'subCommittee':
+						metadata.subcommittee = comm[0].text
+
+			# Get witnesses
+			elif detail.tag == PREFIX + 'witness':
+				name = detail.text
+				last_name = name[:name.find(',')]
+				names = last_name.split()
+				if len(names) > 1:
+					last_name = names[-1]
+
+				metadata.participants.append({'name': name, 'role': 'witness', \
+							      'ln': last_name, 'state': '', 'state-code': ''})
+
+			# Get Congresspersons
+			elif detail.tag == PREFIX + 'congMember':
+				name = last_name = ''
+				state_code = detail.get('state', '')
+				for nametag in detail:
+					if nametag.get('type') == 'authority-lnf':
+						name = nametag.text
+						last_name = nametag.text[:nametag.text.find(',')]
+
+				metadata.participants.append({'name': name, 'role': 'member', 'ln': last_name, \
+							      'state': state_names.get(state_code, ''), 'state-code': state_code})
+
+		# Children of the root and details of the extension are done with once they have been read
+		if len(parents) == 1 or (len(parents) == 2 and parents[1] == PREFIX + 'extension'):
+			element.clear()
+
+	return metadata
+
+
+# Returns the metadata of a document, from the page cache if it was read from the same MODS file before
+def read_metadata(document_id, page):
+	source = hashlib.sha256(page).hexdigest()
+	if page_cache is not None:
+		cached = page_cache.get(document_id, 'metadata')
+		if cached is not None:
+			record = json.loads(cached)
+			if record.get('version') == METADATA_VERSION and record.get('source') == source:
+				return DocumentMetadata.from_record(record)
+
+	metadata = parse_mods(document_id, page)
+	if page_cache is not None:
+		page_cache.put(document_id, 'metadata', json.dumps(metadata.record(source)).encode('utf-8'))
+
+	return metadata
+
+
+# Returns the chairperson the rows of a document are attributed to, its own or its committee's, None if neither
+# is known
+def document_chair(document_id, mods, chairs):
+	metadata = read_metadata(document_id, mods)
+	return chairs.resolve({'id': document_id, 'congress': metadata.congress, 'comm': metadata.committee, \
+			       'subcomm': metadata.subcommittee}) or None
+
+
+# Extracts data from XML files corresponding to the given document ID
+# If the MODS page has already been downloaded it can be passed in as page, or its metadata if it has been read
+def process_xml_file(document_id, page=None):
+
+	if page is None:
+		page = get_page(document_id, type='mods')
+	if isinstance(page, FetchFailure):
+		print("WARNING: Unable to read the MODS file of document {}".format(document_id))
+		return [], ParticipantList()
+
+	if isinstance(page, DocumentMetadata):
+		metadata = page
+	else:
+		with metrics.span('parse_mods', document_id):
+			metadata = read_metadata(document_id, page)
+
+	return metadata.data(), ParticipantList(metadata.participants)
 
 
 # Helper function to prompt the user to manually enter a participant
@@ -296,10 +1625,7 @@ def participant_prompt(participants, document_id):
 	correct = False
 	while not correct:
 
-		congress = document_id[5:8]
-		id = "{}-{}".format(document_id[-5:-3], document_id[-3:])
-
-		url = "https://www.govinfo.gov/link/chrg/{}/{}?link-type={}".format(congress, id, 'html')
+		url = create_page_url(document_id)
 
 		print("Document url: {}".format(url))
 
@@ -356,6 +1682,68 @@ def participant_prompt(participants, document_id):
 	return participant
 
 
+# Prompts the user to select the correct participant out of several matches and returns its index
+def multiple_match_prompt(paragraph, matches):
+	print()
+	print("WARNING: Multiple matches found for potential new speaker: {}".format(paragraph))
+	
+	# Print list of possible matches
+	i = 1
+	for match in matches:
+		print("{} - {}".format(i, match))
+		i += 1
+	
+	# Prompt user to select a match    
+	index = 0
+	while index < 1 or index > len(matches):
+		index = input("Enter the number of the correct participant: ")
+		index = int(index)
+	return index - 1
+
+
+# Prompts the user whether a phrase without a matching participant introduces a new speaker
+# Returns the speaker entered, or False if the phrase doesn't introduce a speaker
+def new_speaker_prompt(paragraph, participants, document_id):
+	print()
+	print("WARNING: No match found for potential new speaker: {}".format(paragraph[:200]))
+	confirmation = ''
+	while confirmation != 'y' and confirmation != 'n':
+		confirmation = input("Is this actually a new speaker? (y/n) ")
+
+	if confirmation == 'y':
+		return participant_prompt(participants, document_id)
+	else:
+		return False
+
+
+# Asks the user one of the questions that come up while parsing, given the kind of question
+def prompt(kind, paragraph, candidates, document_id):
+	if kind == 'potential-match':
+		return potential_match_prompt(candidates[0], paragraph)
+	elif kind == 'new-speaker':
+		return new_speaker_prompt(paragraph, candidates, document_id)
+	elif kind == 'multiple-matches':
+		return multiple_match_prompt(paragraph, candidates)
+	elif kind == 'chairperson':
+		print("WARNING: No chairperson found. Please manually enter the chairperson.")
+		return participant_prompt(candidates, document_id)
+
+
+# Asks a question about the current paragraph (see prompt). In headless mode the answer given in an earlier
+# review is used, or if there is none the question is queued for review and the fallback returned.
+def ask(kind, paragraph, candidates, fallback=None, subject='', per_document=False):
+	metrics.count('prompts', review_queue.location['document'])
+	if interactive:
+		return prompt(kind, paragraph, candidates, review_queue.location['document'])
+
+	key = review_queue.key(kind, subject, per_document)
+	if key in review_queue.resolutions:
+		return review_queue.resolutions[key]
+
+	review_queue.add(key, kind, paragraph, candidates)
+	return fallback
+
+
 # Prompts the user to confirm if a potential match found is correct
 def potential_match_prompt(speaker, paragraph):
 	print("Possible match found: {}".format(speaker))
@@ -371,27 +1759,24 @@ def potential_match_prompt(speaker, paragraph):
 
 # Helper function to check a phrase for a participant and return the participant
 # start_of_string is a flag to make the function only check the form <title>. <last-name>.
+# If the paragraph has already been classified its Line can be passed in as line
 def get_participant(paragraph, participants, document_id, possible_speakers, invalid_speaker_strings, \
-		    start_of_string=False):
+		    start_of_string=False, line=None):
 
-	words = paragraph.split()
+	if line is None:
+		line = Line(paragraph)
+	words = line.words
 	
 	# Check for names
 	last_name = ''
 	matches = []
 
 	# Make sure that the possible speaker phrase is valid
-	for string in invalid_speaker_strings:
-		if len(words) > 1 and words[0] == string[0] and words[1] == string[1]:
-			if len(string) > 2 and len(words) > 2:
-				if words[2] == string[2]:
-					return ()
-			else:
-				return ()
+	if invalid_speaker_strings.matches(words):
+		return ()
 
 	# If not a new statement
-	if len(words) <= 3 or not (words[1][-1] == '.' or words[2][-1] == '.' or \
-			(len(words) >= 5 and (words[3][-1] == '.' or words[4][-1] == '.') and words[2] == 'of')):
+	if not line.candidate:
 		return () # Signal not a new statement
 
 	# Check for typical speaker string form (i.e. "Mr. Gosar. Statement...")
@@ -404,49 +1789,41 @@ def get_participant(paragraph, participants, document_id, possible_speakers, inv
 			else:
 				last_name = words[1]
 
-			# Compare against all participants
-			for participant in participants:
-				if participant['ln'].casefold() == last_name.casefold():
-					matches.append(participant)
-				if len(participant['ln'].split()) > 1 and \
-					participant['ln'].split()[-1].casefold() == last_name.casefold():
-					matches.append(participant)
+			# Compare against all participants, by full last name or by the end of a multi-word last name
+			key = last_name.casefold()
+			multi_word = [i for i in participants.by_last_token.get(key, []) if len(participants[i]['ln'].split()) > 1]
+			matches = participants.select(participants.by_ln.get(key, []), multi_word)
 
 		# Three word match
 		elif words[2][-1] == '.':
 			last_name = words[1] + ' ' + words[2][:-1]
 
 			# Compare against all participants
-			for participant in participants:
-				if participant['ln'].casefold() == last_name.casefold():
-					matches.append(participant)
+			matches = participants.select(participants.by_ln.get(last_name.casefold(), []))
 
 			# If no matches found, check just last word
 			if len(matches) == 0:
-				for participant in participants:
-					if participant['ln'].casefold() == words[2][-1].casefold():
-						matches.append(participant)
+				matches = participants.select(participants.by_ln.get(words[2][-1].casefold(), []))
 
 		# <Last name> of <state>
 		elif len(words) > 3 and words[2] == 'of':
 			last_name = words[1]
 
-			# Compare against all participants
-			for participant in participants:
-				if participant['ln'].casefold() == last_name.casefold() and \
-					(participant['state'].casefold() == words[3][:-1].casefold() or \
-      				participant['state'].casefold() == \
-						"{} {}".format(words[3], words[4][:-1]).casefold()):
-					matches.append(participant)
+			# Compare against all participants, with a one or two word state name
+			key = last_name.casefold()
+			positions = [participants.by_ln_state.get((key, words[3][:-1].casefold()), [])]
+			if len(words) > 4:
+				state = "{} {}".format(words[3], words[4][:-1]).casefold()
+				positions.append(participants.by_ln_state.get((key, state), []))
+			matches = participants.select(*positions)
 
 		# If no matches found, check potential speakers file
 		if len(matches) == 0:
-			for speaker in possible_speakers:
-				if speaker['ln'].casefold() == last_name.casefold():
-					if potential_match_prompt(speaker, paragraph):
-						participants.append(speaker)
-						return (speaker, len(speaker['ln'].split())+1, participants, \
-	      					possible_speakers, invalid_speaker_strings)
+			for speaker in possible_speakers.select(possible_speakers.by_ln.get(last_name.casefold(), [])):
+				if ask('potential-match', paragraph, [speaker], fallback_policy == 'first', speaker['name']):
+					participants.append(speaker)
+					return (speaker, len(speaker['ln'].split())+1, participants, \
+	      				possible_speakers, invalid_speaker_strings)
 
 	# Other types of statements
 	else:
@@ -457,31 +1834,28 @@ def get_participant(paragraph, participants, document_id, possible_speakers, inv
 				word = word[:-1]
 
 			# Check all participants
-			for participant in participants:
-				if word.casefold() == participant['ln'].split()[-1].casefold():
-					matches.append(participant)
+			key = word.casefold()
+			matches += participants.select(participants.by_last_token.get(key, []))
 
 			# If no matches found, check potential speakers file
 			if len(matches) == 0:
-				for speaker in possible_speakers:
-					if speaker['ln'].split()[-1].casefold() == word.casefold():
-						if potential_match_prompt(speaker, paragraph):
-							participants.append(speaker)
-							return (speaker, len(words)-1, participants, possible_speakers, \
-	       							invalid_speaker_strings)
+				for speaker in possible_speakers.select(possible_speakers.by_last_token.get(key, [])):
+					if ask('potential-match', paragraph, [speaker], fallback_policy == 'first', speaker['name']):
+						participants.append(speaker)
+						return (speaker, len(words)-1, participants, possible_speakers, \
+	       						invalid_speaker_strings)
 
 	# Problems with recognizing speakers
 	if len(matches) == 0: # No matches found
 		
-		print()
-		print("WARNING: No match found for potential new speaker: {}".format(paragraph[:200]))
-		confirmation = ''
-		while confirmation != 'y' and confirmation != 'n':
-			confirmation = input("Is this actually a new speaker? (y/n) ")
-			
+		speaker = ask('new-speaker', paragraph, participants)
+
+		# Left for review, keep the paragraph with the current speaker
+		if speaker is None:
+			return ()
+
 		# New speaker found
-		if confirmation == 'y':
-			speaker = participant_prompt(participants, document_id)
+		elif speaker != False:
 			exists = False
 			
 			# Compare manual data against existing participants
@@ -499,9 +1873,9 @@ def get_participant(paragraph, participants, document_id, possible_speakers, inv
 			return (speaker, match_len, participants, possible_speakers, invalid_speaker_strings)
 		
 		# Not a new speaker, add phrase to invalid speaker strings
-		elif confirmation == 'n':
+		else:
 			invalid_speaker_strings.append([words[0], words[1]])
-			return (invalid_speaker_strings)
+			return (invalid_speaker_strings,)
 			
 	elif len(matches) == 1: # One match found
 		speaker = matches[0]
@@ -513,21 +1887,10 @@ def get_participant(paragraph, participants, document_id, possible_speakers, inv
 				
 	else: # Multiple matches found
 		
-		print()
-		print("WARNING: Multiple matches found for potential new speaker: {}".format(paragraph))
-		
-		# Print list of possible matches
-		i = 1
-		for match in matches:
-			print("{} - {}".format(i, match))
-			i += 1
-		
-		# Prompt user to select a match    
-		index = -1
-		while index < 0 or index >= len(matches):
-			index = input("Enter the number of the correct participant: ")
-			index = int(index)
-		speaker = matches[index-1]
+		index = ask('multiple-matches', paragraph, matches, 0 if fallback_policy == 'first' else None)
+		if index is None:
+			return ()
+		speaker = matches[index]
 		if start_of_string:
 			match_len = len(speaker['ln'].split()) + 1
 		else:
@@ -535,14 +1898,87 @@ def get_participant(paragraph, participants, document_id, possible_speakers, inv
 		return (speaker, match_len, participants, possible_speakers, invalid_speaker_strings)
 
 
+# Bracketed text, or a lone bracket where the other one is missing
+BRACKET_RE = re.compile(r"\[[^\]]*\]|\[|\]")
+
+# Leftover markup tags
+TAG_RE = re.compile(r"<[^>]*>")
+
+
+# Removes bracketed text and markup tags from a paragraph in a single pass over each
+# Bracketed text and tags are replaced by a space. A closing bracket without an opening one drops everything
+# before it, an opening bracket without a closing one drops everything after it. Lone angle brackets are kept.
+def remove_extraneous_text(paragraph):
+	# Most paragraphs have neither, and are returned without being scanned by the patterns
+	if '[' not in paragraph and ']' not in paragraph and '<' not in paragraph:
+		return paragraph
+
+	parts = []
+	position = 0
+	for match in BRACKET_RE.finditer(paragraph):
+		if match.group() == ']':
+			parts = []
+		elif match.group() == '[':
+			parts.append(paragraph[position:match.start()])
+			position = len(paragraph)
+			break
+		else:
+			parts.append(paragraph[position:match.start()])
+			parts.append(' ')
+		position = match.end()
+	parts.append(paragraph[position:])
+
+	return TAG_RE.sub(' ', ''.join(parts))
+
+
+# Lines handing the floor to the chairperson, and lines starting text that isn't part of a statement
+LINE_MARKER_RE = re.compile(r"(?P<chair>The Chair(?:man|woman|person)?\.)|" \
+	r"(?P<alt>The Clerk\.|\[The information follows:\]|Letter of|Letter from)", re.IGNORECASE)
+
+
+# Class to hold a line of a hearing split into words once, along with what it looks like:
+# marker is 'chair' for a chairperson's turn and 'alt' for text that isn't spoken (see LINE_MARKER_RE),
+# statement is set for statement headers and candidate for lines shaped like the start of a new speaker's turn
+# ("Mr. Gosar.", "Ms. Garcia Perez." or "Mr. Smith of Ohio.")
+class Line:
+
+	__slots__ = ('text', 'words', 'marker', 'statement', 'candidate', 'qa')
+
+	def __init__(self, paragraph):
+		self.text = paragraph.strip()
+		self.words = words = self.text.split()
+
+		match = LINE_MARKER_RE.match(self.text)
+		self.marker = match.lastgroup if match is not None else None
+
+		self.statement = len(words) > 1 and (words[0].casefold() == 'statement' or \
+			words[1].casefold() == 'statement')
+		self.candidate = len(words) > 3 and (words[1][-1] == '.' or words[2][-1] == '.' or \
+			(len(words) >= 5 and (words[3][-1] == '.' or words[4][-1] == '.') and words[2] == 'of'))
+		self.qa = None
+
+	# Returns the words without trailing commas, as the questions and answers are read
+	def qa_words(self):
+		if self.qa is None:
+			self.qa = [word[:-1] if word[-1] == ',' else word for word in self.words]
+		return self.qa
+
+
 # Processes a single paragraph and returns the updated entries
+# Chairpersons are looked up in and entered into chairs, the ChairIndex of the state store if not given
+# If the paragraph has already been classified its Line can be passed in as line
 def process_paragraph(paragraph, data, participants, chairperson, entries, possible_speakers, \
-		      invalid_speaker_strings):
+		      invalid_speaker_strings, chairs=None, line=None):
+
+	if chairs is None:
+		chairs = get_state_store().chairs
+	if line is None:
+		line = Line(paragraph)
 
 	entries = Entries(entries)
 
-	paragraph = paragraph.strip()
-	words = paragraph.split()
+	paragraph = line.text
+	words = line.words
 
 	# Skip blank lines
 	if paragraph == '':
@@ -553,57 +1989,41 @@ def process_paragraph(paragraph, data, participants, chairperson, entries, possi
 		entries.append_paragraph(paragraph)
 		return (entries.get(), possible_speakers, invalid_speaker_strings)
 
-	# Make a list of the possible other strings which indicate who is speaking
-	chair_ids = ['The Chairman.', 'The Chairwoman.', 'The Chairperson.', 'The Chair.']
-	alt_ids = ['The Clerk.', '[The information follows:]', 'Letter of', 'Letter from']
-
 	# Look for other chair ids
-	for id in chair_ids:
-		if paragraph[:len(id)].casefold() == id.casefold():
+	if line.marker == 'chair':
 
-			# If no chairperson detected
-			if chairperson == {}:
+		# If no chairperson detected
+		if chairperson == {}:
 
-				chairs = []
-				with open('chairs.csv', 'r') as chairs_file:
-					reader = csv.DictReader(chairs_file)
-					for line in reader:
-						chairs.append(line)
+			chairperson = chairs.resolve(data)
 
-				for chair in chairs:
-					if chair['id'] == data['id']:
-						chairperson = literal_eval(chair['chair'])
-
-				if chairperson == {}:
-					print("WARNING: No chairperson found. Please manually enter the chairperson.")
-					chairperson = participant_prompt(participants, data['id'])
-					chairs.append({'id': data['id'], 'chair': chairperson})
+			if chairperson == {}:
+				chairperson = ask('chairperson', paragraph, participants, per_document=True)
 
-					with open('chairs.csv', 'w', newline='') as chairs_file:
-						writer = csv.DictWriter(chairs_file, chairs[0].keys())
-						writer.writeheader()
-						for chair in chairs:
-							writer.writerow(chair)
+				# Left for review, attribute the statement to an unknown speaker
+				if chairperson is None:
+					chairperson = Entry().blank_participant()
+				else:
+					chairs[data['id']] = chairperson
+					chairs.add_committee(data, chairperson)
 
 
-			# Create a new data entry for the next speech
-			entries.add_new_speaker(chairperson, data, ' '.join(words[2:]))
+		# Create a new data entry for the next speech
+		entries.add_new_speaker(chairperson, data, ' '.join(words[2:]))
 
 	# Look for alternate ids
-	for id in alt_ids:
-		if paragraph[:len(id)].casefold() == id.casefold():
+	if line.marker == 'alt':
 
-			# Dispose of following text
-			entries.discard()
+		# Dispose of following text
+		entries.discard()
 
 	append_paragraph = False
 	participant_info = ()
 
 	# Look for statement
-	if len(words) > 1 and (words[0].casefold() == 'statement'.casefold() or \
-		words[1].casefold() == 'statement'.casefold()):
+	if line.statement:
 		participant_info = get_participant(paragraph, participants, data['id'], possible_speakers, \
-				     invalid_speaker_strings)
+				     invalid_speaker_strings, line=line)
 		
 		"""
 		matches = []
@@ -682,11 +2102,12 @@ def process_paragraph(paragraph, data, participants, chairperson, entries, possi
 	# Look for new speaker
 	else:
 		participant_info = get_participant(paragraph, participants, data['id'], possible_speakers, \
-				     invalid_speaker_strings, True)
+				     invalid_speaker_strings, True, line)
 		append_paragraph = True	
 		
 	# New speaker
 	if len(participant_info) == 5:
+		metrics.count('speaker_matches', data['id'])
 		if append_paragraph:
 			entries.add_new_speaker(participant_info[0], data, ' '.join(words[participant_info[1]:]))
 		else:
@@ -704,24 +2125,7 @@ def process_paragraph(paragraph, data, participants, chairperson, entries, possi
 			invalid_speaker_strings = participant_info[0]
 		
 		# Remove extraneous text
-		while True:
-			start_brace = paragraph.find('[')
-			end_brace = paragraph.find(']')
-			if start_brace == -1 and end_brace == -1:
-				break
-			elif start_brace == -1:
-				paragraph = paragraph[end_brace+1:]
-			elif end_brace == -1:
-				paragraph = paragraph[:start_brace]
-			else:
-				paragraph = paragraph[:start_brace] + ' ' + paragraph[end_brace+1:]
-		while True:
-			start_brace = paragraph.find('<')
-			end_brace = paragraph.find('>')
-			if start_brace == -1 or end_brace == -1:
-				break
-			else:
-				paragraph = paragraph[:start_brace] + ' ' + paragraph[end_brace+1:]
+		paragraph = remove_extraneous_text(paragraph)
 
 		if not paragraph.isupper():
 			entries.append_paragraph(paragraph)
@@ -729,33 +2133,26 @@ def process_paragraph(paragraph, data, participants, chairperson, entries, possi
 	return (entries.get(), possible_speakers, invalid_speaker_strings)
 
 
-# Given a single hearing, processes each line of the hearing and returns the list of entries
-def process_hearing(content, data, participants, chairperson):
+# Paragraphs starting an appendix or other text that isn't part of the hearing
+APPENDIX_RE = re.compile(r"\s*(Submitted [^ ]+ by|APPENDIX|Appendix|A P P E N D I X)")
+
+# Matches the heading line above the members of a committee in the heading of a document
+COMMITTEE_HEADING_RE = re.compile(r"\s*(?:COMMITTEE\s+\S|(?:HOUSE|SELECT)\s+COMMITTEE(?:\s|$))")
 
-	# Look for appendicies and other unnecessary information
-	re_str = re.compile(r"\n\s*(Submitted [^ ]+ by|APPENDIX|Appendix|A P P E N D I X)")
-	re_match = re.search(re_str, content)
-	if re_match is not None:
-		appendix = content[re_match.end():]
-		content = content[:re_match.start()]
-	else:
-		appendix = ''
 
-	# Split the body of the text by paragraph
-	paragraphs = content.split('\n')
+# Given the paragraphs of a single hearing, processes each of them and yields its entries as each one is closed
+# The invalid speaker strings, possible speakers and chairpersons are taken from and added to state, the
+# state store if not given
+def process_hearing(paragraphs, data, participants, chairperson, state=None):
 
-	# Read invalid speaker strings from file
-	invalid_speaker_strings = []
-	with open('invalid-speaker-strings.txt', 'r') as invalid_file:
-		for line in invalid_file:
-			invalid_speaker_strings.append(line.split())
+	paragraphs = iter(paragraphs)
+	appendix = iter(())
 
-	# Read possible speakers from file
-	possible_speakers = []
-	with open('possible-speakers.csv', 'r') as speakers_file:
-		reader = csv.DictReader(speakers_file)
-		for line in reader:
-			possible_speakers.append(line)
+	if state is None:
+		state = get_state_store()
+	invalid_speaker_strings = state.invalid_speaker_strings
+	possible_speakers = state.possible_speakers
+	chairs = state.chairs
 
 	entries = Entries()
 
@@ -766,7 +2163,15 @@ def process_hearing(content, data, participants, chairperson):
 	skip = False
 	questions_from = Entry().blank_participant()
 	questions_to = Entry().blank_participant()
-	for paragraph in paragraphs:
+	line = None
+	for offset, paragraph in enumerate(paragraphs):
+		review_queue.locate(data['id'], data['date'], offset)
+
+		# Look for appendicies and other unnecessary information, which take up the rest of the hearing
+		appendix_match = APPENDIX_RE.match(paragraph)
+		if appendix_match is not None and offset > 0:
+			appendix = itertools.chain([paragraph[appendix_match.end():]], paragraphs)
+			break
 
 		# Skip single line functionality
 		if skip:
@@ -782,7 +2187,7 @@ def process_hearing(content, data, participants, chairperson):
 				source = True
 
 		# Detect missing source end
-		if source and len(paragraph) > 2 and (paragraph[:2] != r'\\' and paragraph[:2] != '--'):
+		if source and len(paragraph) > 2 and (paragraph[:1] != '\\' and paragraph[:2] != '--'):
 			source = False
 
 		# Look for reports or other information
@@ -799,10 +2204,12 @@ def process_hearing(content, data, participants, chairperson):
 		# If not a source or report, process the paragraph
 		if not source and not report and not skip:
 
-			words = paragraph.strip().split()
-			words = list(map(lambda x : x[:-1] if x[-1] == ',' else x, words))
+			line = Line(paragraph)
+			words = line.words
 
 			# Look for Q&A inside the text
+			if len(words) > 2 and words[0].startswith("Questions"):
+				words = line.qa_words()
 			if len(words) > 2 and (words[0] == "Questions" and \
 					words[1].casefold() == "Submitted".casefold()):
 				questions = True
@@ -815,8 +2222,9 @@ def process_hearing(content, data, participants, chairperson):
 				
 				# Check for participants
 				participant_info = get_participant(paragraph, participants, data['id'], \
-				       							   possible_speakers, invalid_speaker_strings)
+				       							   possible_speakers, invalid_speaker_strings, line=line)
 				if len(participant_info) == 5:
+					metrics.count('speaker_matches', data['id'])
 					if to_flag:
 						questions_to = participant_info[0]
 					else:
@@ -830,6 +2238,7 @@ def process_hearing(content, data, participants, chairperson):
 
 			# Process Q&A
 			if questions:
+				words = line.qa_words()
 				if len(words) > 0 and (words[0] == "Question." or \
 					(words[0] == "Question" and words[1][-1] == '.')):
 					if words[0] == "Question.":
@@ -845,16 +2254,19 @@ def process_hearing(content, data, participants, chairperson):
 			# Process paragraph normally
 			else:
 				paragraph_info = process_paragraph(paragraph, data, participants, chairperson, \
-						entries.get(), possible_speakers, invalid_speaker_strings)
+						entries.get(), possible_speakers, invalid_speaker_strings, chairs, line)
 				entries = Entries(paragraph_info[0])
 				possible_speakers = paragraph_info[1]
 				invalid_speaker_strings = paragraph_info[2]
-			
-	# Look for Q&A in appendix
+
+		yield from entries.pop_closed()
+
+	# Look for Q&A in appendix, going by the words of the last line read
+	words = line.qa_words() if line is not None else []
 	questions = False
 	questions_from = Entry().blank_participant()
 	questions_to = Entry().blank_participant()
-	for paragraph in appendix.split('\n'):
+	for paragraph in appendix:
 
 		# Detect questions
 		if paragraph.casefold().find("Question".casefold()) or \
@@ -878,147 +2290,852 @@ def process_hearing(content, data, participants, chairperson):
 			else:
 				entries.append_paragraph(paragraph)
 
-	# Save all invalid speaker strings
-	with open('invalid-speaker-strings.txt', 'w') as invalid_file:
-		for string in invalid_speaker_strings:
-			line = ' '.join(string)
-			invalid_file.write(line + '\n')
-
-	# Save all possible speakers
-	with open('possible-speakers.csv', 'w', newline='') as possible_speakers_file:
-		writer = csv.DictWriter(possible_speakers_file, possible_speakers[0].keys())
-		writer.writeheader()
-		for speaker in possible_speakers:
-			writer.writerow(speaker)
+		yield from entries.pop_closed()
 
 	entries.clean()
 
-	return entries.get()
+	yield from entries.get()
+
+
+# Returns a hearing date (YYYY-MM-DD) the way transcripts write it, e.g. "Tuesday, March 1, 2022"
+@functools.lru_cache(maxsize=4096)
+def format_hearing_date(date):
+	date = datetime.date(*map(int, date.split('-')))
+	return date.strftime("%A, %B {}, %Y".format(date.day))
+
+
+# Returns a pattern matching a date string in any case
+@functools.lru_cache(maxsize=4096)
+def date_string_pattern(date_string):
+	return re.compile(re.escape(date_string), re.IGNORECASE)
+
+
+# Finds the last occurrence of each of the date strings in a list of lines or paragraphs
+# The texts are joined and lowercased once, and each date string is looked for from the end as a literal,
+# falling back to a scan with its pattern when lowercasing changed the length of the text or the literal
+# found isn't a match of the pattern.
+# Returns (index of the text, match) for each date string, None for those that don't occur
+def find_last_dates(texts, date_strings):
+	starts = []
+	position = 0
+	for text in texts:
+		starts.append(position)
+		position += len(text) + 1
+	folded = '\n'.join(texts).lower()
+	literal = len(folded) == max(position - 1, 0)
+
+	last = {}
+	for date_string in dict.fromkeys(date_strings):
+		pattern = date_string_pattern(date_string)
+		match = None
+		if literal:
+			found = folded.rfind(date_string.lower())
+			if found == -1:
+				last[date_string] = None
+				continue
+			index = bisect.bisect_right(starts, found) - 1
+			match = pattern.match(texts[index], found - starts[index])
+		if match is None:
+			for index in range(len(texts) - 1, -1, -1):
+				for match in pattern.finditer(texts[index]):
+					pass
+				if match is not None:
+					break
+		last[date_string] = (index, match) if match is not None else None
+
+	return [last[date_string] for date_string in date_strings]
+
+
+# Yields the paragraphs between two (index, offset) positions, up to the last paragraph if end is None
+def slice_paragraphs(paragraphs, start, end=None):
+	if end is None:
+		end = (len(paragraphs) - 1, len(paragraphs[-1]))
+	if start > end:
+		return
 
+	index, offset = start
+	while index < end[0]:
+		yield paragraphs[index][offset:]
+		index += 1
+		offset = 0
+	yield paragraphs[index][offset:end[1]]
+
+
+# Charset declared in the <meta> tags of a page
+CHARSET_RE = re.compile(rb"""<meta[^>]+charset=["']?([\w-]+)""", re.IGNORECASE)
+
+
+# Returns the encoding a page declares, UTF-8 if it doesn't declare one Python knows
+def page_encoding(raw_content):
+	match = CHARSET_RE.search(raw_content, 0, 4096)
+	if match is not None:
+		try:
+			return codecs.lookup(match.group(1).decode('ascii')).name
+		except LookupError:
+			pass
+	return 'utf-8'
+
+
+# Class to collect the text inside the <pre> tags of a page, which hold the transcript in the HTML renditions
+class PreTextParser(HTMLParser):
+
+	def __init__(self):
+		super().__init__(convert_charrefs=True)
+		self.depth = 0
+		self.chunks = []
+
+	def handle_starttag(self, tag, attrs):
+		if tag == 'pre':
+			self.depth += 1
+
+	def handle_endtag(self, tag):
+		if tag == 'pre' and self.depth > 0:
+			self.depth -= 1
+
+	def handle_data(self, data):
+		if self.depth > 0:
+			self.chunks.append(data)
+
+	# Removes and returns the text collected so far
+	def take(self):
+		text = ''.join(self.chunks)
+		self.chunks = []
+		return text
+
+
+# Decodes a page with the charset it declares and yields the lines of its transcript, parsing it in blocks
+def page_lines(raw_content):
+	encoding = page_encoding(raw_content)
+	if encoding == 'utf-8':
+		encoding = 'utf-8-sig' # Drops a byte order mark
+	decoder = codecs.getincrementaldecoder(encoding)(errors='replace')
+	parser = PreTextParser()
+
+	view = memoryview(raw_content)
+	rest = ''
+	for start in range(0, len(raw_content), PAGE_BLOCK_SIZE):
+		parser.feed(decoder.decode(view[start:start + PAGE_BLOCK_SIZE]))
+		lines = (rest + parser.take()).split('\n')
+		rest = lines.pop()
+		yield from lines
+
+	parser.feed(decoder.decode(b'', final=True))
+	parser.close()
+	yield from (rest + parser.take()).split('\n')
+
+
+# Joins the lines of a transcript into paragraphs
+# A paragraph starts on a line indented by four spaces, on a line starting with '--' and after a blank line.
+# The lines it was wrapped onto are joined to it with a space.
+def join_paragraphs(lines):
+	paragraph = []
+	for line in lines:
+		line = line.rstrip('\r')
+		if line.strip() == '' or line[:4] == '    ' or line[:2] == '--':
+			if len(paragraph) > 0:
+				yield ' '.join(paragraph)
+			paragraph = []
+
+		if line.strip() == '':
+			continue
+		elif line[:4] == '    ':
+			paragraph.append(line[4:])
+		else:
+			paragraph.append(line)
 
-# Processes the text of the HTML file corresponding to the given document ID
-def process_html_file(document_id, data, participants):
+	if len(paragraph) > 0:
+		yield ' '.join(paragraph)
 
-	raw_content = get_page(document_id)
-	content = str(raw_content)
 
-	# Fix paragraph breaks
-	content = content.replace(r'\n    ', '\n')
-	content = content.replace(r'\n\n', '\n')
+# Processes the text of the HTML file corresponding to the given document ID and yields its entries
+# If the HTML page has already been downloaded it can be passed in as raw_content
+def process_html_file(document_id, data, participants, raw_content=None, state=None):
+
+	if raw_content is None:
+		raw_content = get_page(document_id)
+	if isinstance(raw_content, FetchFailure) or len(data) == 0:
+		print("WARNING: Unable to read document {}\n".format(document_id))
+		return
+	started = time.perf_counter()
+	lines = list(page_lines(raw_content))
 
 	# Generate date strings from the dates found
-	date_strings = []
-	for hearing in data:
-		date_list = hearing['date'].split('-')
-		date_list = list(map(int, date_list))
-		date = datetime.date(*date_list)
-		date_string = date.strftime("%A, %B {}, %Y".format(date.day))
-		date_strings.append({'str': date_string, 'data': hearing})
+	date_strings = [format_hearing_date(hearing['date']) for hearing in data]
 
 	# Find the first date string and separate the header of the document from the body
-	first_date_re = re.compile(date_strings[0]['str'], re.IGNORECASE)
-	first_date_iter = first_date_re.finditer(content)
-	first_date_locations = [x for x in first_date_iter]
-	if len(first_date_locations) == 0:
+	start = find_last_dates(lines, date_strings[:1])[0]
+	if start is None:
 		print("WARNING: Unable to find start of text in document {}\n".format(document_id))
-		return []
-	start = first_date_locations[-1]
-	heading = content[:start.start()]
-	content = content[start.start():]
-
-	# Remove '\n's
-	content = content.replace(r'\n--', '\n')
-	content = content.replace(r'\n', '')
-	heading = heading.replace(r'\n', '\n')
-
-	# Split document by meeting days
-	if len(date_strings) > 0:
-		hearings = []
-		rest = content
-		for date in date_strings:
-			date_re = re.compile(date['str'], re.IGNORECASE)
-			date_iter = date_re.finditer(content)
-			date_locations = [x for x in date_iter]
-			start = date_locations[-1]
-			hearings.append({'data': data, 'content': '', 'location': start})
-		for i in range(len(hearings)-1):
-			hearings[i]['content'] = \
-				content[hearings[i]['location'].end():hearings[i+1]['location'].start()]
-		hearings[-1]['content'] = content[hearings[-1]['location'].end():]
-
-	# Find the name of the chairperson of the committee
+		return
+	index, match = start
+	heading = lines[:index] + [lines[index][:match.start()]]
+	paragraphs = list(join_paragraphs([lines[index][match.start():]] + lines[index+1:]))
+	del lines
+
+	# Split document by meeting days, leaving the text of a day that can't be found with the day before
+	hearings = []
+	for hearing, date_string, start in zip(data, date_strings, find_last_dates(paragraphs, date_strings)):
+		if start is None:
+			print("WARNING: Unable to find the hearing of {} in document {}\n".format(date_string, document_id))
+			continue
+		index, match = start
+		hearings.append({'data': hearing, 'start': (index, match.end()), 'end': None, \
+				 'location': (index, match.start())})
+	if len(hearings) == 0:
+		return
+	for i in range(len(hearings)-1):
+		hearings[i]['end'] = hearings[i+1]['location']
+
+	# Find the chairperson of the committee, from the chairpersons already known or the heading of the document
+	if state is None:
+		state = get_state_store()
+	chairperson = state.chairs.resolve(data[0])
+	if chairperson == {}:
+		chairperson = heading_chairperson(heading, participants)
+		if chairperson != {}:
+			state.chairs.add_committee(data[0], chairperson)
+
+	metrics.record('split_dates', document_id, time.perf_counter() - started)
+	metrics.count('paragraphs', document_id, len(paragraphs))
+
+	for hearing in hearings:
+		yield from metrics.timed('process_hearing', document_id, process_hearing(slice_paragraphs(paragraphs, \
+			hearing['start'], hearing['end']), hearing['data'], participants, chairperson, state))
+
+
+# Returns the participant the heading of a document lists as the chairperson of the committee, {} if none
+# The chairperson is looked for in the few lines below each committee heading, as "<name>, <state>, Chair..."
+# or as "<name>, <state>" followed by a line starting with "Chair"
+def heading_chairperson(heading, participants):
 	chair_name = ''
 	chair_state = ''
-	lines = heading.split('\n')
-	index = 0
 	line_count = 0
-	for line in lines:
-		if len(line.split()) > 1 and (line.split()[0] == 'COMMITTEE' or ((line.split()[0] == 'HOUSE' or \
-    		line.split()[0] == 'SELECT') and line.split()[1] == 'COMMITTEE')):
+	for index, line in enumerate(heading):
+		if COMMITTEE_HEADING_RE.match(line):
 			line_count = 4
 
 		if line_count > 0:
 			line_count -= 1
-			line = line.strip()
-			line = line.split(', ')
-			if len(line) > 1 and (line[1] == 'Jr.' or line[1] == 'Sr.'): # Handle 'Jr.'
-				del line[1]
-			if len(line) == 3:
-				if line[2][:5] == 'Chair':
-					chair_state = line[1]
-					name_list = line[0].split()
-					chair_name = name_list[-1]
-					break
-			elif len(line) == 2:
-				if lines[index + 1].strip()[:5] == 'Chair':
-					chair_state = line[1]
-					name_list = line[0].split()
-					chair_name = name_list[-1]
-					break
-		
-		index += 1
+			parts = line.strip().split(', ')
+			if len(parts) > 1 and (parts[1] == 'Jr.' or parts[1] == 'Sr.'): # Handle 'Jr.'
+				del parts[1]
+			if (len(parts) == 3 and parts[2][:5] == 'Chair') or (len(parts) == 2 and index + 1 < len(heading) \
+				and heading[index + 1].strip()[:5] == 'Chair'):
+				chair_state = parts[1]
+				chair_name = parts[0].split()[-1]
+				break
 
-	# Find the info for the chairperson of the committee
-	chairperson = {}
-	for participant in participants:
-		if participant['state'] == chair_state and \
-			participant['ln'].split()[-1].casefold() == chair_name.casefold():
-			chairperson = participant
+	# The last participant with the last name and state, found through the index of last names
+	positions = [i for i in participants.by_last_token.get(chair_name.casefold(), []) \
+		     if participants[i]['state'] == chair_state]
+	if len(positions) == 0:
+		return {}
+	return participants[positions[-1]]
 
-	i = 0
-	entries = []
-	for hearing in hearings:
-		entries += process_hearing(hearing['content'], data[i], participants, chairperson)
-		i += 1
 
-	return entries
+# State store snapshot of a parsing worker process, taken when the worker starts and never written to disk
+worker_state = None
+
+
+def init_worker(state, resolutions, policy, instrumented):
+	global worker_state, interactive, fallback_policy, page_cache, metrics
+	worker_state = state
+	metrics = Metrics() if instrumented else NullMetrics()
+
+	# Workers have no terminal to prompt on, and leave the page cache to the main process
+	interactive = False
+	page_cache = None
+	fallback_policy = policy
+	review_queue.resolutions = resolutions
+
+
+# Parses a downloaded document and yields its entries as rows
+def parse_document(document_id, mods, html, state=None):
+	url = create_page_url(document_id)
+	print("\n\nProcessing document: {}\nUrl: {}\n".format(document_id, url))
+
+	data, participants = process_xml_file(document_id, mods)
+	for entry in process_html_file(document_id, data, participants, html, state):
+		yield entry.data()
+
+
+# Parses a document in a worker process against a private copy of the worker's state snapshot, so that
+# documents never see each other's discoveries, and returns its rows along with the state it added and its
+# metrics
+def parse_document_worker(document_id, mods, html):
+	state = worker_state.copy()
+	rows = list(parse_document(document_id, mods, html, state))
+	additions = state.additions(worker_state)
+
+	return rows, additions, review_queue.drain(), metrics.take(document_id)
+
+
+# Parses downloaded documents and yields (document_id, mods, html, future) in input order, where the future
+# holds the rows of the document, the shared state it added, the questions it queued for review and its
+# metrics. With more than one worker, documents are parsed in headless mode by a pool of worker processes, each
+# holding a read-only snapshot of the shared state. With a single worker, the rows are parsed as they are read
+# and the questions and metrics are left in review_queue and metrics.
+def parse_documents(documents, workers=1):
+	if workers <= 1:
+		for id, mods, html in documents:
+			future = Future()
+			if isinstance(mods, FetchFailure) or isinstance(html, FetchFailure):
+				future.set_result(([], None, [], None))
+			else:
+				future.set_result((parse_document(id, mods, html), None, None, None))
+			yield id, mods, html, future
+		return
+
+	pending = deque()
+	with ProcessPoolExecutor(max_workers=workers, initializer=init_worker, \
+			  initargs=(get_state_store(), review_queue.resolutions, fallback_policy, \
+			  isinstance(metrics, Metrics))) as executor:
+		for id, mods, html in documents:
+			if isinstance(mods, FetchFailure) or isinstance(html, FetchFailure):
+				future = Future()
+				future.set_result(([], None, [], None))
+			else:
+				# The metadata is read here, where the page cache is
+				try:
+					with metrics.span('parse_mods', id):
+						metadata = read_metadata(id, mods)
+				except Exception as e:
+					future = Future()
+					future.set_exception(e)
+				else:
+					future = executor.submit(parse_document_worker, id, metadata, html)
+			pending.append((id, mods, html, future))
+
+			# Keep every worker busy without holding on to more pages than needed
+			if len(pending) > 2 * workers:
+				yield pending.popleft()
+
+		while len(pending) > 0:
+			yield pending.popleft()
+
+
+# Output backends take the rows of each document through write() and are told when the document ends
+# with commit() or failed part way through with rollback(). commit() returns whether the rows of every
+# committed document have been saved, offset is where the saved rows end, which the output is truncated to
+# when it is opened again to resume a run.
+
+# Class to write rows to a CSV output file through a single buffered file for the whole run
+class CsvOutput:
+
+	def __init__(self, path, append=False, offset=None, buffer_size=OUTPUT_BUFFER_SIZE):
+		self.path = path
+
+		# Drop rows written after the last recorded document, which were never checkpointed
+		if append and offset is not None and os.path.getsize(path) > offset:
+			with open(path, 'r+b') as f:
+				f.truncate(offset)
+
+		self.file = open(path, 'a' if append else 'w', encoding='utf-8', newline='', buffering=buffer_size)
+		self.writer = csv.DictWriter(self.file, Entry().keys())
+		if not append:
+			self.writer.writeheader()
+		self.offset = self.file.tell()
+
+	def write(self, row):
+		self.writer.writerow(row)
+
+	# Writes the buffered rows to disk
+	def commit(self):
+		self.file.flush()
+		os.fsync(self.file.fileno())
+		self.offset = self.file.tell()
+		return True
+
+	# Drops the rows written since the last commit
+	def rollback(self):
+		self.file.truncate(self.offset)
+		self.file.seek(self.offset)
+
+	def close(self):
+		self.rollback()
+		self.commit()
+		self.file.close()
+
+	# Removes the rows of the given documents from a CSV output file and returns its new size
+	@staticmethod
+	def remove_documents(path, ids):
+		temp_path = path + '.tmp'
+		with open(path, 'r', encoding='utf-8', newline='') as f, \
+			open(temp_path, 'w', encoding='utf-8', newline='') as temp_file:
+			reader = csv.DictReader(f)
+			csv_writer = csv.DictWriter(temp_file, Entry().keys())
+			csv_writer.writeheader()
+			for row in reader:
+				if row['document'] not in ids:
+					csv_writer.writerow(row)
+		os.replace(temp_path, path)
+
+		return os.path.getsize(path)
+
+
+# Class to write rows to a directory of Parquet files partitioned by congress (<path>/congress=<congress>/)
+# Rows are buffered by partition and written once row_group_size of them are waiting, each partition to a new
+# file holding them as a single row group. Files are written under a temporary name and renamed when
+# complete, so a file is either missing or holds only whole committed documents.
+# Files are named after the run writing them and numbered in order. The offset maps each run to the number of
+# files it had written when the rows were last saved, files past it are deleted when the output is opened
+# again to resume a run.
+class ParquetOutput:
+
+	def __init__(self, path, append=False, offset=None, row_group_size=ROW_GROUP_SIZE):
+		if pyarrow is None:
+			raise RuntimeError("Parquet output needs pyarrow (pip install pyarrow)")
+
+		self.path = path
+		self.row_group_size = row_group_size
+
+		self.columns = [key for key in Entry().keys() if key != 'congress']
+		self.schema = pyarrow.schema([(column, pyarrow.string()) for column in self.columns])
+		self.run = '{}-{}'.format(datetime.datetime.now().strftime('%Y%m%d%H%M%S'), os.getpid())
+
+		# Maps each congress to the rows waiting to be written, and to how many of them are committed
+		self.buffers = {}
+		self.committed = {}
+		self.size = 0
+
+		os.makedirs(path, exist_ok=True)
+		files = {}
+		for directory, _, names in os.walk(path):
+			for name in names:
+				part = ParquetOutput.part(name)
+				if name.endswith('.tmp') or (part is not None and (not append or \
+					(offset is not None and part[1] >= offset.get(part[0], 0)))):
+					os.remove(os.path.join(directory, name))
+				elif part is not None:
+					files[part[0]] = max(files.get(part[0], 0), part[1] + 1)
+
+		# Without a checkpoint, every file is taken to hold saved rows
+		self.offset = dict(offset) if append and offset is not None else files
+		self.files = self.offset.get(self.run, 0)
+
+	# Returns the run and number of a part file from its name, None if it isn't one
+	@staticmethod
+	def part(name):
+		if not name.startswith('part-') or not name.endswith('.parquet'):
+			return None
+		run, _, number = name[len('part-'):-len('.parquet')].rpartition('-')
+		if not number.isdigit():
+			return None
+		return run, int(number)
+
+	def write(self, row):
+		congress = str(row['congress'])
+		if congress not in self.buffers:
+			self.buffers[congress] = []
+			self.committed[congress] = 0
+		self.buffers[congress].append(row)
+		self.size += 1
+
+	def commit(self):
+		for congress in self.buffers:
+			self.committed[congress] = len(self.buffers[congress])
+
+		if self.size < self.row_group_size:
+			return self.size == 0
+		self.flush()
+		return True
+
+	def rollback(self):
+		for congress in self.buffers:
+			self.size -= len(self.buffers[congress]) - self.committed[congress]
+			del self.buffers[congress][self.committed[congress]:]
+
+	# Writes the buffered rows of each partition to a new file
+	def flush(self):
+		for congress, rows in self.buffers.items():
+			if len(rows) == 0:
+				continue
+
+			directory = os.path.join(self.path, 'congress={}'.format(congress))
+			os.makedirs(directory, exist_ok=True)
+			path = os.path.join(directory, 'part-{}-{:05d}.parquet'.format(self.run, self.files))
+			self.files += 1
+
+			table = pyarrow.Table.from_pydict({column: [row[column] for row in rows] for column in self.columns}, \
+				schema=self.schema)
+			self.write_table(table, path)
+
+		self.buffers = {}
+		self.committed = {}
+		self.size = 0
+		if self.files > 0:
+			self.offset = dict(self.offset, **{self.run: self.files})
+
+	def write_table(self, table, path):
+		pyarrow.parquet.write_table(table, path + '.tmp', row_group_size=self.row_group_size, \
+			use_dictionary=PARQUET_DICTIONARY_COLUMNS, compression=PARQUET_COMPRESSION)
+		os.replace(path + '.tmp', path)
+
+	def close(self):
+		self.rollback()
+		self.flush()
+
+	# Removes the rows of the given documents from every file of a Parquet output
+	# Files keep their names, so the offset is left as it is and None is returned
+	@staticmethod
+	def remove_documents(path, ids):
+		if pyarrow is None:
+			raise RuntimeError("Parquet output needs pyarrow (pip install pyarrow)")
+
+		for directory, _, names in os.walk(path):
+			for name in names:
+				if not name.endswith('.parquet'):
+					continue
+				file_path = os.path.join(directory, name)
+
+				table = pyarrow.parquet.read_table(file_path)
+				matches = pyarrow.compute.is_in(table['document'], value_set=pyarrow.array(list(ids)))
+				if not pyarrow.compute.any(matches).as_py():
+					continue
+
+				table = table.filter(pyarrow.compute.invert(matches))
+				if table.num_rows == 0:
+					os.remove(file_path)
+				else:
+					pyarrow.parquet.write_table(table, file_path + '.tmp', \
+						use_dictionary=PARQUET_DICTIONARY_COLUMNS, compression=PARQUET_COMPRESSION)
+					os.replace(file_path + '.tmp', file_path)
+
+		return None
+
+
+# Class to write rows to an SQLite database of documents, participants and statements
+# The rows of a document are inserted together when it is committed, and the transaction is committed every
+# batch_size statements. The offset is the ID of the last saved statement, statements after it are deleted
+# when the database is opened again to resume a run.
+class SqliteOutput:
+
+	def __init__(self, path, append=False, offset=None, batch_size=SQLITE_BATCH_SIZE):
+		self.path = path
+		self.batch_size = batch_size
+
+		if not append:
+			for suffix in ('', '-wal', '-shm', '-journal'):
+				if os.path.exists(path + suffix):
+					os.remove(path + suffix)
+
+		# Transactions are begun and committed explicitly
+		self.connection = sqlite3.connect(path, isolation_level=None)
+		self.connection.execute("PRAGMA journal_mode = WAL")
+		self.connection.execute("PRAGMA synchronous = NORMAL")
+		self.connection.executescript(SQLITE_SCHEMA)
+		try:
+			self.connection.executescript(SQLITE_FTS_SCHEMA)
+		except sqlite3.OperationalError as e:
+			print("WARNING: No full-text index of statements: {}".format(e))
+
+		if append and offset is not None:
+			self.connection.execute("DELETE FROM statements WHERE id > ?", (offset,))
+		self.offset = self.last_statement()
+
+		# Maps (name, state, role) to the ID of the participant
+		self.participants = {}
+		for id, name, state, role in self.connection.execute("SELECT id, name, state, role FROM participants"):
+			self.participants[(name, state, role)] = id
+
+		self.rows = []
+		self.pending = 0
+		self.connection.execute("BEGIN")
+
+	def last_statement(self):
+		return self.connection.execute("SELECT COALESCE(MAX(id), 0) FROM statements").fetchone()[0]
+
+	def participant(self, row):
+		key = (row['name'], row['state'], row['role'])
+		if key not in self.participants:
+			self.connection.execute("INSERT OR IGNORE INTO participants (name, state, role) VALUES (?, ?, ?)", key)
+			self.participants[key] = self.connection.execute( \
+				"SELECT id FROM participants WHERE name IS ? AND state IS ? AND role IS ?", key).fetchone()[0]
+		return self.participants[key]
+
+	def write(self, row):
+		self.rows.append(row)
+
+	def commit(self):
+		documents = {row['document']: row for row in self.rows}
+		self.connection.executemany("INSERT OR REPLACE INTO documents (id, congress, committee, subcommittee, " \
+			"title) VALUES (?, ?, ?, ?, ?)", [(row['document'], row['congress'], row['committee'], \
+			row['subcommittee'], row['title']) for row in documents.values()])
+		self.connection.executemany("INSERT INTO statements (document, date, participant, text) " \
+			"VALUES (?, ?, ?, ?)", [(row['document'], row['date'], self.participant(row), row['text']) \
+			for row in self.rows])
+
+		self.pending += len(self.rows)
+		self.rows = []
+		if self.pending < self.batch_size:
+			return self.pending == 0
+
+		self.save()
+		return True
+
+	def rollback(self):
+		self.rows = []
+
+	# Commits the transaction and begins the next one
+	def save(self):
+		self.connection.execute("COMMIT")
+		self.offset = self.last_statement()
+		self.pending = 0
+		self.connection.execute("BEGIN")
+
+	def close(self):
+		self.rollback()
+		self.connection.execute("COMMIT")
+		self.offset = self.last_statement()
+		self.connection.close()
+
+	# Removes the statements of the given documents from a database and returns the ID of the last statement
+	@staticmethod
+	def remove_documents(path, ids):
+		connection = sqlite3.connect(path)
+		with connection:
+			for id in ids:
+				connection.execute("DELETE FROM statements WHERE document = ?", (id,))
+				connection.execute("DELETE FROM documents WHERE id = ?", (id,))
+		offset = connection.execute("SELECT COALESCE(MAX(id), 0) FROM statements").fetchone()[0]
+		connection.close()
+
+		return offset
+
+
+OUTPUT_FORMATS = {'csv': CsvOutput, 'parquet': ParquetOutput, 'sqlite': SqliteOutput}
 
 
 # Processes documents given a list of document IDs
-def process_documents(ids, output_file):
+# Pages are downloaded by concurrency worker threads while earlier documents are being parsed, by workers
+# processes if more than one. Parallel workers don't write the side-car files, the speaker strings,
+# speakers and chairpersons they find are merged into the state store as their documents finish.
+# Rows are written as they are parsed to an output of output_format (see OUTPUT_FORMATS), created with the
+# keyword arguments in output_options.
+# The outcome of each document is recorded in a manifest next to the output, along with what its rows were
+# parsed from (see reprocess_documents). With resume, documents already completed or skipped are left out and
+# new rows are appended to the existing output. With retry_failed, only the documents that failed are
+# processed again (all of them if ids is None).
+def process_documents(ids, output_file, concurrency=FETCH_CONCURRENCY, resume=False, retry_failed=False, \
+		      workers=1, output_format='csv', output_options=None):
+
+	append = (resume or retry_failed) and os.path.exists(output_file)
+	manifest = Manifest(manifest_path(output_file), fresh=not append)
+
+	if retry_failed:
+		failed = manifest.ids(Manifest.FAILED)
+		ids = failed if ids is None else [id for id in ids if id in failed]
+	elif resume:
+		ids = [id for id in ids if manifest.status(id) not in (Manifest.COMPLETED, Manifest.SKIPPED)]
+
+	if append:
+		print("Resuming: {} documents left to process".format(len(ids)))
+
+	output = OUTPUT_FORMATS[output_format](output_file, append, manifest.offset(), **(output_options or {}))
+	state = get_state_store()
+
+	# Documents whose rows the output hasn't saved yet, recorded in the manifest once it has
+	unsaved = []
+	try:
+		for id, mods, html, future in parse_documents(prefetch_documents(ids, concurrency), workers):
+
+			failures = [page.data() for page in (mods, html) if isinstance(page, FetchFailure)]
+			if len(failures) > 0:
+				manifest.record(id, Manifest.FAILED, error="Couldn't download document", failures=failures, \
+						offset=output.offset)
+				metrics.finish(id, Manifest.FAILED)
+				continue
+
+			entries = 0
+			try:
+				rows, document_additions, review_items, document_metrics = future.result()
+				if document_metrics is not None:
+					metrics.merge(id, document_metrics)
+				for row in rows:
+					with metrics.span('write', id):
+						output.write(row)
+					entries += 1
+			except Exception as e:
+				print("ERROR: Failed to process document {}: {!r}".format(id, e))
+				review_queue.drain()
+				output.rollback()
+				manifest.record(id, Manifest.FAILED, error=repr(e), offset=output.offset)
+				metrics.finish(id, Manifest.FAILED)
+				continue
+
+			# Parallel workers parse against the snapshot of the state store they started with
+			if review_items is None:
+				review_items = review_queue.drain()
+			if document_additions is not None:
+				state.merge(document_additions)
+				seen = document_additions['sizes']
+			else:
+				seen = state.sizes()
+			state.flush()
+			review_queue.append(review_items)
+
+			metrics.count('entries_written', id, entries)
+			status = Manifest.COMPLETED if entries > 0 else Manifest.SKIPPED
+			unsaved.append((id, status, {'entries': entries, 'inputs': input_digest(mods, html), \
+				'parser': PARSER_VERSION, 'state': list(seen[:2]), 'chair': document_chair(id, mods, state.chairs)}))
+			with metrics.span('write', id):
+				saved = output.commit()
+			metrics.finish(id, status)
+			if saved:
+				for id, status, details in unsaved:
+					manifest.record(id, status, offset=output.offset, **details)
+				unsaved = []
+	finally:
+		output.close()
+		for id, status, details in unsaved:
+			manifest.record(id, status, offset=output.offset, **details)
+		manifest.close()
+		state.flush(force=True)
+
+
+# Asks the user every question queued by headless runs, then processes the affected documents again so that
+# the answers are applied to them, replacing their rows in the output
+def review_documents(output_file, concurrency=FETCH_CONCURRENCY, workers=1, output_format='csv', \
+		     output_options=None):
+	items = [item for item in review_queue.read() if item['key'] not in review_queue.resolutions]
+	if len(items) == 0:
+		print("No questions left to review")
+		return
+
+	i = 1
+	for item in items:
+		print("\n\nReview {} of {}: document {} ({}), paragraph {}\nUrl: {}\n".format(i, len(items), \
+			item['document'], item['date'], item['offset'], create_page_url(item['document'])))
+		resolution = prompt(item['kind'], item['paragraph'], item['candidates'], item['document'])
+		review_queue.resolve(item['key'], resolution)
+		i += 1
+
+	affected = list(dict.fromkeys(item['document'] for item in items))
+	print("\n\nProcessing {} reviewed documents again".format(len(affected)))
 
-	with open(output_file, 'w+', encoding='utf-8', newline='') as f:
-		csv_writer = csv.DictWriter(f, Entry().keys())
-		csv_writer.writeheader()
+	# Questions still open for the affected documents are raised again as they are processed
+	review_queue.rewrite([item for item in review_queue.read() if item['document'] not in affected])
 
-	for id in ids:
-		congress = id[5:8]
-		id_number = "{}-{}".format(id[-5:-3], id[-3:])
-		url = "https://www.govinfo.gov/link/chrg/{}/{}?link-type=html".format(congress, id_number)
-		print("\n\nProcessing document: {}\nUrl: {}\n".format(id, url))
+	replace_documents(affected, 'pending review', output_file, concurrency, workers, output_format, \
+			  output_options)
 
-		data, participants = process_xml_file(id)
-		entries = process_html_file(id, data, participants)
 
-		with open(output_file, 'a', encoding='utf-8', newline='') as f:
-			csv_writer = csv.DictWriter(f, Entry().keys())
+# Removes the rows of documents from the output, leaving the rows of other documents where the output format
+# allows it, and processes the documents again. They are recorded as failed for the given reason until then,
+# so that an interrupted run picks them up with retry_failed.
+def replace_documents(ids, reason, output_file, concurrency=FETCH_CONCURRENCY, workers=1, output_format='csv', \
+		      output_options=None):
+	if os.path.exists(output_file):
+		offset = OUTPUT_FORMATS[output_format].remove_documents(output_file, set(ids))
+		manifest = Manifest(manifest_path(output_file), fresh=False)
+		if offset is None:
+			offset = manifest.offset()
+		for id in ids:
+			manifest.record(id, Manifest.FAILED, error=reason, offset=offset)
+		manifest.close()
 
-			for entry in entries:
-				csv_writer.writerow(entry.data())
+	process_documents(ids, output_file, concurrency, retry_failed=True, workers=workers, \
+			  output_format=output_format, output_options=output_options)
+
+
+# Returns whether entries added to the invalid speaker strings or possible speakers could change the rows
+# parsed from a page: an invalid speaker string matching the start of a line, or a possible speaker whose
+# last name is one of the names a statement or new speaker line is looked up by
+def affected_by_state(html, invalid_speaker_strings, possible_speakers):
+	if len(invalid_speaker_strings) == 0 and len(possible_speakers) == 0:
+		return False
+
+	strings = SpeakerStringList(invalid_speaker_strings)
+	names = set()
+	for speaker in possible_speakers:
+		names.add(speaker['ln'].casefold())
+		names.update(speaker['ln'].casefold().split()[-1:])
+
+	for paragraph in join_paragraphs(page_lines(html)):
+		line = Line(paragraph)
+		if strings.matches(line.words):
+			return True
+
+		if line.statement:
+			words = line.words
+		elif line.candidate:
+			words = line.words[1:3] + [' '.join(line.words[1:3])]
+		else:
+			continue
+		if any(word.strip('.,[]').casefold() in names for word in words):
+			return True
+
+	return False
+
+
+# Returns why the rows of a document recorded in the manifest are out of date, or None if they aren't
+def stale_reason(record, mods, html, state):
+	if 'inputs' not in record:
+		return 'not tracked'
+	if record['inputs'] != input_digest(mods, html):
+		return 'pages changed'
+	if record['parser'] != PARSER_VERSION:
+		return 'parser changed'
+	if record['chair'] != document_chair(record['id'], mods, state.chairs):
+		return 'chairperson changed'
+
+	invalid_count, possible_count = record['state']
+	if affected_by_state(html, state.invalid_speaker_strings[invalid_count:], \
+			     state.possible_speakers[possible_count:]):
+		return 'new side-car entries'
+
+	return None
+
+
+# Processes again the completed and skipped documents of an output (those in ids if given) whose rows could
+# have changed since they were processed: the pages of the document changed, PARSER_VERSION was raised,
+# its chairperson changed, or entries added to the invalid speaker strings or possible speakers since apply
+# to it. Their rows are replaced in the output, the rows of every other document are left as they are.
+def reprocess_documents(output_file, ids=None, concurrency=FETCH_CONCURRENCY, workers=1, output_format='csv', \
+			output_options=None):
+	if not os.path.exists(manifest_path(output_file)):
+		print("No manifest of {} to reprocess".format(output_file))
+		return
+
+	manifest = Manifest(manifest_path(output_file), fresh=False)
+	manifest.close()
+	candidates = [id for id, record in manifest.records.items() if (ids is None or id in ids) and \
+		      record['status'] in (Manifest.COMPLETED, Manifest.SKIPPED)]
+
+	state = get_state_store()
+	reasons = {}
+	for id, mods, html in prefetch_documents(candidates, concurrency):
+		if isinstance(mods, FetchFailure) or isinstance(html, FetchFailure):
+			print("WARNING: Unable to check document {}, leaving its rows as they are".format(id))
+			continue
+		reason = stale_reason(manifest.records[id], mods, html, state)
+		if reason is not None:
+			reasons[id] = reason
+
+	if len(reasons) == 0:
+		print("All {} documents are up to date".format(len(candidates)))
+		return
+
+	counts = {}
+	for reason in reasons.values():
+		counts[reason] = counts.get(reason, 0) + 1
+	print("\n\nProcessing {} of {} documents again: {}".format(len(reasons), len(candidates), \
+		', '.join('{} {}'.format(count, reason) for reason, count in counts.items())))
+
+	replace_documents(list(reasons), 'pending reprocessing', output_file, concurrency, workers, output_format, \
+			  output_options)
+
+
+# Closes the page cache, the package ZIPs and the metrics at the end of a run
+def close_sources():
+	if page_cache is not None:
+		page_cache.close()
+	if page_source is not None:
+		page_source.close()
+	metrics.close()
 
 
 def main():
-	# ids = get_list('115')
 	id1 = 'CHRG-115hhrg33477'
 	id2 = 'CHRG-117hhrg45006'
 	id3 = 'CHRG-117hhrg46542' # Includes multiple hearings
@@ -1028,7 +3145,120 @@ def main():
 	id7 = 'CHRG-117hhrg44244' # Includes questions inside the text
 	id8 = 'CHRG-117hhrg46928' # Includes letter in text
 
-	process_documents([id8], 'hearing-data.csv')
+	parser = argparse.ArgumentParser(description='Extracts statements from congressional hearing transcripts')
+	parser.add_argument('ids', nargs='*', help='IDs of the documents to process (e.g. {})'.format(id8))
+	parser.add_argument('--congress', nargs='+', \
+		     help='process every hearing listed for these Congresses (e.g. 115 116)')
+	parser.add_argument('--new-only', action='store_true', \
+		     help='only process hearings modified since the Congress was last listed')
+	parser.add_argument('--refresh-list', action='store_true', help="list the Congress again instead of using the cached listing")
+	parser.add_argument('-o', '--output', help='file (directory for Parquet) to write the statements to ' \
+		     '(defaults to {})'.format(' or '.join(DEFAULT_OUTPUTS.values())))
+	parser.add_argument('-f', '--format', choices=OUTPUT_FORMATS.keys(), default='csv', \
+		     help='format of the output')
+	parser.add_argument('-j', '--concurrency', type=int, default=FETCH_CONCURRENCY, \
+		     help='number of documents downloaded in parallel')
+	mode = parser.add_mutually_exclusive_group()
+	mode.add_argument('--resume', action='store_true', \
+		   help='skip documents the last run already finished and append to its output')
+	mode.add_argument('--retry-failed', action='store_true', \
+		   help='only process the documents that failed in the last run')
+	parser.add_argument('-w', '--workers', type=int, default=1, \
+		     help='number of processes parsing documents in parallel (implies --headless)')
+	parser.add_argument('--headless', action='store_true', \
+		     help='queue questions about ambiguous speakers for review instead of asking them')
+	parser.add_argument('--fallback', choices=FALLBACK_POLICIES, default=FALLBACK_POLICIES[0], \
+		     help='how ambiguous speakers are handled until reviewed in headless mode')
+	parser.add_argument('--review', action='store_true', \
+		     help='answer the queued questions and process the affected documents again')
+	parser.add_argument('--reprocess', action='store_true', \
+		     help='process again the documents (of those given, if any) whose pages, parser version or ' \
+		     'side-car entries changed, replacing their rows in the output')
+	parser.add_argument('--rate', type=float, default=RATE_LIMITS['www.govinfo.gov'][0], \
+		     help='largest number of document requests per second')
+	parser.add_argument('--pool-size', type=int, \
+		     help='number of connections kept open to each host (defaults to the concurrency)')
+	parser.add_argument('--cache', default=CACHE_DIRECTORY, help='directory to keep downloaded pages in')
+	parser.add_argument('--cache-size', type=int, default=CACHE_SIZE_LIMIT // (1024 * 1024), \
+		     help='size limit of the page cache in MB')
+	parser.add_argument('--no-cache', action='store_true', help='always download pages')
+	parser.add_argument('--offline', action='store_true', help='only read pages from the cache')
+	parser.add_argument('--zip', action='append', \
+		     help='govinfo package ZIP, or directory of them, to read pages from instead of downloading them ' \
+		     '(processes every package in them if no IDs are given)')
+	parser.add_argument('--buffer-size', type=int, default=OUTPUT_BUFFER_SIZE // 1024, \
+		     help='size of the write buffer of CSV output in KB')
+	parser.add_argument('--row-group-size', type=int, default=ROW_GROUP_SIZE, \
+		     help='number of statements in each row group of Parquet output')
+	parser.add_argument('--batch-size', type=int, default=SQLITE_BATCH_SIZE, \
+		     help='number of statements inserted into SQLite output in each transaction')
+	parser.add_argument('--flush-interval', type=float, default=STATE_FLUSH_INTERVAL, \
+		     help='seconds between writes of the invalid speaker strings, possible speakers and chairs files')
+	parser.add_argument('--metrics', help='file to write the time spent in each stage and other counters to')
+	parser.add_argument('--metrics-format', choices=Metrics.FORMATS, default=Metrics.FORMATS[0], \
+		     help='jsonl for a line per document and the totals, prometheus for the totals as a textfile')
+	args = parser.parse_args()
+
+	if args.format == 'parquet' and pyarrow is None:
+		parser.error('Parquet output needs pyarrow (pip install pyarrow)')
+	output_file = args.output or DEFAULT_OUTPUTS[args.format]
+	output_options = {'csv': {'buffer_size': args.buffer_size * 1024}, \
+			  'parquet': {'row_group_size': args.row_group_size}, \
+			  'sqlite': {'batch_size': args.batch_size}}[args.format]
+
+	global session, rate_limiters, page_cache, page_source, interactive, fallback_policy, state_store, metrics
+	session = create_session(args.pool_size or max(args.concurrency, 1))
+	rate_limits = dict(RATE_LIMITS)
+	rate_limits['www.govinfo.gov'] = (args.rate, max(1, int(args.rate)))
+	rate_limiters = create_rate_limiters(rate_limits)
+	if args.zip:
+		page_source = PackageArchive(args.zip)
+	elif not args.no_cache:
+		page_cache = PageCache(args.cache, args.cache_size * 1024 * 1024, args.offline)
+
+	state_store = StateStore(flush_interval=args.flush_interval)
+	if args.metrics:
+		metrics = Metrics(args.metrics, args.metrics_format)
+
+	interactive = not (args.headless or args.review or args.workers > 1)
+	fallback_policy = args.fallback
+	review_queue.load_resolutions()
+
+	if args.review:
+		try:
+			review_documents(output_file, args.concurrency, args.workers, args.format, output_options)
+		finally:
+			close_sources()
+		return
+
+	if args.reprocess:
+		try:
+			reprocess_documents(output_file, args.ids or None, args.concurrency, args.workers, args.format, \
+					    output_options)
+		finally:
+			close_sources()
+		return
+
+	if args.congress:
+		# Congresses are listed concurrently since the pages of a single listing can't be
+		with ThreadPoolExecutor(max_workers=len(args.congress)) as executor:
+			listings = executor.map(lambda congress: get_list(congress, args.new_only, args.refresh_list), \
+			   args.congress)
+		ids = [id for listing in listings for id in listing]
+	elif len(args.ids) > 0:
+		ids = args.ids
+	elif args.retry_failed:
+		ids = None
+	elif page_source is not None:
+		ids = page_source.ids()
+	else:
+		ids = [id8]
+
+	try:
+		process_documents(ids, output_file, args.concurrency, args.resume, args.retry_failed, args.workers, \
+				  args.format, output_options)
+	finally:
+		close_sources()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,17 @@
+import importlib.util
+import os
+import sys
+
+
+# Loads hearing-data.py as a module, since its name can't be imported directly
+def load_hearing_data():
+	if 'hearing_data' in sys.modules:
+		return sys.modules['hearing_data']
+
+	path = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'hearing-data.py')
+	spec = importlib.util.spec_from_file_location('hearing_data', path)
+	module = importlib.util.module_from_spec(spec)
+	# Registered so that worker processes can unpickle its classes
+	sys.modules['hearing_data'] = module
+	spec.loader.exec_module(module)
+	return module